@@ -21,15 +21,7 @@ class AcmDLTranslator(bibtex.Translator):
         affiliations = self._expand_affiliations(None, authors)
         keywords = []
         if 'keywords' in fields:
-            all_keywords = self._all_uncurly(fields['keywords']).split(',')
-            keyword_names = set()
-            for keyword_name in all_keywords:
-                name = keyword_name.strip().capitalize()
-                if name not in keyword_names:
-                    keyword_names.add(name)
-            keyword_names = list(keyword_names)
-            for keyword_name in keyword_names:
-                keywords.append(domain.Keyword(name=keyword_name))
+            keywords = self._keywords_from_field(self._all_uncurly(fields['keywords']), ',')
         document = domain.Document(proto_document['id'].strip(), kind, title, abstract, keywords, year, affiliations)
         document.generator = "ACM Digital Library"
         if 'journal' in fields:
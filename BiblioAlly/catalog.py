@@ -1,14 +1,26 @@
 """
 Declares and exports the main class of BiblioAlly, the Catalog class and some utility functions.
 """
+import asyncio
 import datetime
-from functools import reduce
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, aliased
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from sqlalchemy import (bindparam, column, create_engine, event, exists, false, func, insert, inspect, literal_column,
+                        table, update)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql.expression import select
 
-from BiblioAlly import domain
+from BiblioAlly import domain, scanner, translator as bibtex
+from BiblioAlly.utility import TitleMinHash, normalized_doi, title_fingerprint
 
 TAG_SELECTED = 'Selected'
 TAG_DUPLICATE = 'Duplicate'
@@ -16,6 +28,46 @@ TAG_REJECTED = 'Rejected'
 TAG_IMPORTED = 'Imported'
 TAG_PRE_SELECTED = 'Pre-selected'
 
+PROFILE_SAFE = 'safe'
+PROFILE_INTERACTIVE = 'interactive'
+PROFILE_BULK_IMPORT = 'bulk-import'
+
+QUERY_CHUNK_SIZE = 500
+ASYNC_IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+LOAD_BROWSE = ['authors.author', 'tags.tag']
+LOAD_EXPORT = ['authors.author', 'authors.institution', 'keywords', 'references', 'tags.tag']
+NEAR_DUPLICATE_THRESHOLD = 0.75
+NEAR_DUPLICATE_YEAR_GAP = 1
+
+_logger = logging.getLogger(__name__)
+_title_min_hash = TitleMinHash()
+_document_search = table('Document_Search', column('rowid'))
+
+
+class ImportProgress(namedtuple('ImportProgress', ['entries', 'added', 'duplicates', 'elapsed'])):
+    """
+    The progress of an import, as reported to the progress callback of Catalog.import_from_file().
+
+    Attributes:
+        entries: the amount of entries of the .bib file read so far;
+        added: the amount of documents added so far, duplicates included;
+        duplicates: the amount of documents added so far that were tagged as duplicates;
+        elapsed: the seconds elapsed since the import started.
+    """
+
+
+class ExportProgress(namedtuple('ExportProgress', ['documents', 'exported', 'elapsed'])):
+    """
+    The progress of an export, as reported to the progress callback of Catalog.export_to_file().
+
+    Attributes:
+        documents: the amount of documents to be exported;
+        exported: the amount of documents written so far;
+        elapsed: the seconds elapsed since the export started.
+    """
+
 
 class Catalog:
     """
@@ -31,6 +83,9 @@ class Catalog:
     incompatible with each other). Currently, recognized BibTeX dialects are from ACM Digital Library, IEEE Xplore,
     Scopus and Web of Science.
 
+    Documents can be found by example (documents_by()) or by a full-text search over their titles, abstracts and
+    keywords (search()), ranked by relevance.
+
     Each BibTeX dialect is identified by a registered string name and handled by a particular translator class. A
     Translator class is an artifact that knows the particularities of a certain dialect in order to read from and
     write to correctly.
@@ -48,14 +103,29 @@ class Catalog:
         -DocumentMetadata: Metadata describing important information about a given Document;
         -Tag: a tag related to a given Document.
 
+    SQLite connections are tuned by a named profile, a set of PRAGMAs registered in Catalog.profiles:
+        -safe: rollback journal and synchronous=FULL, the SQLite defaults (the default profile);
+        -interactive: write-ahead log, synchronous=NORMAL, a 64 MiB page cache and memory-mapped reads, for browsing
+        and tagging, where many small transactions are committed;
+        -bulk-import: write-ahead log, synchronous=OFF and a 256 MiB page cache; a crash of the machine during an
+        import may corrupt the catalog, so it is meant to be used only while importing.
+
     Attributes:
         _engine: SqlAlchemy engine for SQLite;
         _session: SqlAlchemy session for database operations.
     """
 
     translators = dict()
-
-    def __init__(self, catalog_path=None, echo=False, future=True):
+    profiles = {
+        PROFILE_SAFE: {'busy_timeout': 5000, 'journal_mode': 'DELETE', 'synchronous': 'FULL', 'cache_size': -2000,
+                       'mmap_size': 0, 'temp_store': 'DEFAULT'},
+        PROFILE_INTERACTIVE: {'busy_timeout': 5000, 'journal_mode': 'WAL', 'synchronous': 'NORMAL',
+                              'cache_size': -64 * 1024, 'mmap_size': 256 * 1024 * 1024, 'temp_store': 'MEMORY'},
+        PROFILE_BULK_IMPORT: {'busy_timeout': 5000, 'journal_mode': 'WAL', 'synchronous': 'OFF',
+                              'cache_size': -256 * 1024, 'mmap_size': 1024 * 1024 * 1024, 'temp_store': 'MEMORY'},
+    }
+
+    def __init__(self, catalog_path=None, echo=False, future=True, profile=PROFILE_SAFE):
         """
         Initializes a newly created instance and set it up for operation.
 
@@ -63,15 +133,27 @@ class Catalog:
             catalog_path: the path and file name of the catalog file;
             echo: with True all the SQL operations issued against SQLite will be echoed to the console; it is
             useful for debug operations; default is False;
-            future: just passed to the SQLite engine.
+            future: just passed to the SQLite engine;
+            profile: the name of the connection profile, one of Catalog.profiles; default is PROFILE_SAFE.
+
+        The near_duplicate_threshold attribute is the least title similarity, from 0.0 to 1.0, for an imported
+        document to be taken as a near-duplicate of another one; with None, only documents with the very same title
+        are taken as duplicates.
         """
 
         self._engine = None
         self._session = None
+        self._profile = PROFILE_SAFE
         self._system_tags = []
         self._system_tag_names = [TAG_SELECTED, TAG_DUPLICATE, TAG_REJECTED, TAG_IMPORTED, TAG_PRE_SELECTED]
+        self.import_statistics = dict()
+        self.near_duplicate_threshold = NEAR_DUPLICATE_THRESHOLD
+        self._titles_indexed = False
+        self._searchable = False
+        self._tag_ids_by_name = dict()
+        self._worker = None
         if catalog_path is not None:
-            self.open(catalog_path, echo, future)
+            self.open(catalog_path, echo, future, profile)
 
     def add_summary(self, summary: domain.DocumentAttachment) -> domain.DocumentAttachment:
         """
@@ -133,15 +215,28 @@ class Catalog:
 
         return self._session.execute(select(domain.Author).filter_by(**kwargs)).scalars().all()
 
-    def document_by(self, tagged_as=None, untagged_as=None, **kwargs):
+    def document_by(self, tagged_as=None, untagged_as=None, load=None, tagged_all=None, tagged_any=None,
+                    untagged_any=None, **kwargs):
         """
         Query-by-example for one single document.
 
         Parameters:
             tagged_as : (optional)
-                a name or a list of names of tags that are required to be assigned to the document.
+                a name or a list of names of tags of which at least one is required to be assigned to the document;
+                the same as tagged_any.
             untagged_as : (optional)
-                a name or a list of names of tags that are required to NOT be assigned to the document.
+                a name or a list of names of tags that are required to not be assigned to the document; the same as
+                untagged_any.
+            load : (optional)
+                a list of relationship paths of Document to be loaded along with the documents, such as
+                ['authors.author', 'tags.tag', 'keywords']; LOAD_BROWSE and LOAD_EXPORT list those used to show and to
+                export documents.
+            tagged_all : (optional)
+                a name or a list of names of tags that are all required to be assigned to the document.
+            tagged_any : (optional)
+                a name or a list of names of tags of which at least one is required to be assigned to the document.
+            untagged_any : (optional)
+                a name or a list of names of tags of which none is allowed to be assigned to the document.
             **kwargs :
                 a list of attribute names and values that will work as an example of the desired instance.
 
@@ -157,18 +252,33 @@ class Catalog:
             catalog.document_by(doi='biblio-ally/10000.0000')
         """
 
-        stm = self._document_by(tagged_as=tagged_as, untagged_as=untagged_as, **kwargs)
+        stm = self._document_by(tagged_as, untagged_as, tagged_all, tagged_any, untagged_any, **kwargs)
+        if load is not None:
+            stm = stm.options(*self._load_options(load))
         return self._session.execute(stm).scalars().first()
 
-    def documents_by(self, tagged_as=None, untagged_as=None, **kwargs):
+    def documents_by(self, tagged_as=None, untagged_as=None, load=None, tagged_all=None, tagged_any=None,
+                     untagged_any=None, **kwargs):
         """
         Query-by-example for documents.
 
         Parameters:
             tagged_as : (optional)
-                a name or a list of names of tags that are required to be assigned to the document.
+                a name or a list of names of tags of which at least one is required to be assigned to the document;
+                the same as tagged_any.
             untagged_as : (optional)
-                a name or a list of names of tags that are required to not be assigned to the document.
+                a name or a list of names of tags that are required to not be assigned to the document; the same as
+                untagged_any.
+            load : (optional)
+                a list of relationship paths of Document to be loaded along with the documents, such as
+                ['authors.author', 'tags.tag', 'keywords']; LOAD_BROWSE and LOAD_EXPORT list those used to show and to
+                export documents.
+            tagged_all : (optional)
+                a name or a list of names of tags that are all required to be assigned to the document.
+            tagged_any : (optional)
+                a name or a list of names of tags of which at least one is required to be assigned to the document.
+            untagged_any : (optional)
+                a name or a list of names of tags of which none is allowed to be assigned to the document.
             **kwargs :
                 a list of attribute names and values that will work as an example of the desired instances.
 
@@ -179,13 +289,76 @@ class Catalog:
 
         If no instance can be found with the criteria specified, an empty list is returned.
 
+        The relationships not listed in load are loaded lazily, with one query per document the first time each of
+        them is used. Those listed are loaded up front: collections with one extra query per 500 documents and
+        relationship, and the Author, Institution or Tag they refer to within that same query.
+
         Example:
             catalog.documents_by(tagged_as=catalog.domain.INCLUDED, untagged_as=[catalog.domain.DUPLICATE])
+            catalog.documents_by(load=['authors.author', 'tags.tag', 'keywords'])
         """
 
-        stm = self._document_by(tagged_as=tagged_as, untagged_as=untagged_as, **kwargs)
+        stm = self._document_by(tagged_as, untagged_as, tagged_all, tagged_any, untagged_any, **kwargs)
+        if load is not None:
+            stm = stm.options(*self._load_options(load))
         return self._session.execute(stm).scalars().all()
 
+    def iter_documents_by(self, tagged_as=None, untagged_as=None, batch_size=1000, load=None, tagged_all=None,
+                          tagged_any=None, untagged_any=None, **kwargs):
+        """
+        Query-by-example for documents, streamed in batches.
+
+        Parameters:
+            tagged_as : (optional)
+                a name or a list of names of tags of which at least one is required to be assigned to the document;
+                the same as tagged_any.
+            untagged_as : (optional)
+                a name or a list of names of tags that are required to not be assigned to the document; the same as
+                untagged_any.
+            batch_size : (optional)
+                the amount of documents read from the database at a time; default is 1000.
+            load : (optional)
+                a list of relationship paths of Document to be loaded along with each batch, as in documents_by().
+            tagged_all, tagged_any, untagged_any : (optional)
+                names of tags the document is required to have all, any or none of, as in documents_by().
+            **kwargs :
+                a list of attribute names and values that will work as an example of the desired instances.
+
+        Returns:
+            an iterator over the Documents, if any, that meet the criteria passed, in the order of their IDs.
+
+        The documents are read by keyset pagination, each batch starting after the greatest ID of the former one.
+        Once a batch is consumed, the changes made to its documents are flushed and the documents are expunged
+        from the session, along with their authors, tags, attachments and references, so the memory needed does
+        not grow with the catalog. The documents must not be used after the iteration moves past their batch, but
+        those already in the session when their batch was read, such as the ones held by the caller, are kept.
+
+        Example:
+            years = collections.Counter(d.year for d in catalog.iter_documents_by(untagged_as=TAG_DUPLICATE))
+            table = as_dict(catalog.iter_documents_by(load=LOAD_BROWSE), fields=['year', 'title', 'authors'])
+        """
+
+        session = self._session
+        statement = self._document_by(tagged_as, untagged_as, tagged_all, tagged_any, untagged_any, **kwargs)\
+            .order_by(domain.Document.id).limit(batch_size)
+        if load is not None:
+            statement = statement.options(*self._load_options(load))
+        last_document_id = None
+        while True:
+            batch_statement = statement
+            if last_document_id is not None:
+                batch_statement = statement.where(domain.Document.id > last_document_id)
+            held_keys = set(session.identity_map.keys())
+            batch = session.execute(batch_statement).scalars().all()
+            if len(batch) == 0:
+                return
+            yield from batch
+            last_document_id = batch[-1].id
+            session.flush()
+            for document in batch:
+                if document in session and inspect(document).key not in held_keys:
+                    session.expunge(document)
+
     def keyword_by(self, **kwargs):
         """
         Query-by-example for one single keyword.
@@ -270,7 +443,8 @@ class Catalog:
 
         return self._session.execute(select(domain.Tag).filter_by(**kwargs)).scalars().all()
 
-    def import_from_file(self, source: str, filename: str):
+    def import_from_file(self, source: str, filename: str, parser=None, workers=None, bulk=False, chunk_size=None,
+                         progress=None, resume=True, incremental=False):
         """
         Imports references from a file.
 
@@ -279,9 +453,38 @@ class Catalog:
                 the identifier of the BibTex dialect.
             filename :
                 the file name of the .bib file to be imported.
+            parser : (optional)
+                the identifier of the parser backend that reads the .bib file; default is the memory-mapped scanner.
+            workers : (optional)
+                with more than one worker, the .bib file is split at entry boundaries into chunks of about the same
+                size, which are parsed and translated by that many worker processes; only the scanners support
+                this mode and the documents come out in file order, so duplicates are detected exactly as in a
+                serial import.
+            bulk : (optional)
+                with True, the imported documents are written with bulk INSERT statements instead of going through
+                the ORM unit of work, which is much faster for big files; the resulting database is the same. The
+                import runs under the PROFILE_BULK_IMPORT connection profile, and the former one is restored when
+                it is done.
+            chunk_size : (optional)
+                with a number of entries, the file is imported as a stream of chunks of that size: each chunk is
+                translated, persisted, committed and expunged from the session before the next one is read, so the
+                memory needed does not grow with the file; workers are not used in this mode.
+            progress : (optional)
+                a callable that receives an ImportProgress after each chunk is committed, or once at the end when the
+                file is not imported in chunks.
+            resume : (optional)
+                a chunked import records an ImportCheckpoint along with each chunk; with True (the default), an import
+                of the same file that was interrupted is resumed right after its last committed chunk, otherwise it
+                starts over.
+            incremental : (optional)
+                with True, only the entries never imported from this source before are translated and persisted:
+                the catalog keeps a manifest of the files imported this way (ImportSource) and the digest of the raw
+                contents of each entry (ImportedEntry), so a file that did not change is not scanned at all and, for
+                one that did, the cost of the refresh depends on the new entries. The memory-mapped scanner is
+                always used in this mode, and chunk_size and workers are ignored.
 
         Returns:
-            the amount of documents added;
+            the amount of documents added (by the interrupted runs too, when resumed);
             the amount of documents present in the .bib file;
             the amount of documents in the BiblioAlly base after the import.
 
@@ -292,53 +495,179 @@ class Catalog:
             3. Scopus: Translator for Scopus BibTeX files.
             4. WebOfScience: Translator for Web of Science BibTeX files.
 
+        The parser backends registered out of the box are identified by the following constants of module
+        "translator":
+            1. PARSER_MMAP: a brace-aware scanner that memory-maps the file and decodes only the field values the
+               translator reads (the default).
+            2. PARSER_SCANNER: a streaming, brace-aware scanner that reads the file in chunks.
+            3. PARSER_LINE: the former line based parser, kept for comparison purposes.
+            4. PARSER_ARPEGGIO: the Arpeggio grammar declared in module "parse", with packrat memoization.
+
+        A document is a duplicate of another one when their titles are the same or, as long as
+        Catalog.near_duplicate_threshold is not None, similar enough: titles are sketched by utility.TitleMinHash
+        and indexed by their band keys (TitleBand), so the candidates are found without comparing every pair of
+        titles, and the similarity is kept in Document.duplicate_similarity. Similar titles do not make a
+        near-duplicate of documents with different DOIs, or published more than NEAR_DUPLICATE_YEAR_GAP years apart.
+        A document with the same title and generator of one already in the catalog is not added again.
+
+        Author fields and affiliations are parsed through bounded memo caches, as the same ones repeat a lot
+        across the documents of a file. When the import finishes, the hits and misses of each cache are kept in
+        Catalog.import_statistics, as translator.CacheStatistics instances, and logged at the INFO level.
+
         Example:
             import BiblioAlly.wos as wos
             added, loaded, total = catalog.import_from_file(wos.WebOfScience, '.\\WoS\\refs.bib')
+            print(catalog.import_statistics['affiliations'].hit_rate)
+            catalog.import_from_file(wos.WebOfScience, '.\\WoS\\huge.bib', chunk_size=5000,
+                                     progress=lambda p: print(f'{p.entries} entries, {p.added} added'))
         """
 
         if source not in Catalog.translators:
             return 0, 0, 0
         translator_class = Catalog.translators[source]
+        if parser is not None and parser not in translator_class.parsers:
+            return 0, 0, 0
         translator = translator_class()
-        loaded_documents = translator.documents_from_file(filename)
-        authors = reduce(lambda x, y: x + y, [document.authors for document in loaded_documents])
-        author_names = dict()
-        for author in authors:
-            name = author.author.long_name if author.author.long_name != '' else author.author.short_name
-            if name not in author_names:
-                author_names[name] = author.author
-        institutions = [author.institution for author in authors if author.institution is not None]
-        institution_names = dict()
-        for institution in institutions:
-            if institution.name not in institution_names:
-                institution_names[institution.name] = institution
-        added_count = 0
+        if incremental:
+            return self._import_file_incrementally(source, translator, filename, bulk, progress)
+        if chunk_size is not None:
+            return self._import_file_in_chunks(source, translator, filename, parser, bulk, chunk_size, progress, resume)
+        start = time.perf_counter()
+        loaded_documents = translator.documents_from_file(filename, parser, workers)
+        self._report_import_statistics(translator.cache_statistics)
+        added_count = duplicate_count = 0
+        previous_profile = self._profile
+        if bulk:
+            self.use_profile(PROFILE_BULK_IMPORT)
         try:
-            session = self._session
-            for loaded_document in loaded_documents:
-                existing_document = session.execute(select(domain.Document).
-                                                    filter_by(title_crc32=loaded_document.title_crc32))\
-                    .scalars().first()
-                if existing_document is not None and existing_document.generator == loaded_document.generator:
-                    continue
-                loaded_document.import_date = datetime.date.today()
-                self._update_authors(loaded_document, author_names)
-                self._update_institutions(loaded_document, institution_names)
-                self._update_keywords(loaded_document)
-                added_count += 1
-                if existing_document is not None:
-                    self._tag(loaded_document, TAG_DUPLICATE)
-                    existing_document.duplicates.append(loaded_document)
-                else:
-                    self._tag(loaded_document, TAG_IMPORTED)
-                    session.add(loaded_document)
+            added_count, duplicate_count = self._import_documents(loaded_documents, bulk)
         finally:
             self._session.commit()
             total_count = self._session.query(domain.Document).count()
+            self.use_profile(previous_profile)
+        if progress is not None:
+            progress(ImportProgress(len(loaded_documents), added_count, duplicate_count, time.perf_counter() - start))
         return added_count, len(loaded_documents), total_count
 
-    def export_to_file(self, target: str, filename: str, should_export=None):
+    async def import_from_file_async(self, source: str, filename: str, parser=None, bulk=False,
+                                     chunk_size=ASYNC_IMPORT_CHUNK_SIZE, progress=None, resume=True, incremental=False):
+        """
+        Imports references from a file without blocking the running event loop.
+
+        Parameters:
+            source :
+                the identifier of the BibTex dialect.
+            filename :
+                the file name of the .bib file to be imported.
+            parser : (optional)
+                the identifier of the parser backend that reads the .bib file; default is the memory-mapped scanner.
+            bulk : (optional)
+                with True, the imported documents are written with bulk INSERT statements, as in import_from_file().
+            chunk_size : (optional)
+                the number of entries imported and committed at a time; default is ASYNC_IMPORT_CHUNK_SIZE. With
+                None, the whole file is imported in one single transaction, which cannot be cancelled halfway.
+            progress : (optional)
+                a callable that receives an ImportProgress after each chunk is committed; it is called in the event
+                loop, so it may touch any state the other coroutines of the application use.
+            resume : (optional)
+                with True (the default), an import of the same file that was interrupted or cancelled is resumed right
+                after its last committed chunk, as in import_from_file().
+            incremental : (optional)
+                with True, only the entries never imported from this source before are imported, as in
+                import_from_file(); the refresh runs in one single transaction.
+
+        Returns:
+            the same counts import_from_file() does.
+
+        Parsing, translation and persistence are those of import_from_file(), run in a worker thread owned by the
+        catalog, so the event loop keeps serving other requests while the import runs. Every asynchronous
+        operation of a catalog runs in that same thread, one after the other, in the order they were requested;
+        the synchronous methods must not be called while one of them is pending, since the catalog session is
+        not meant to be shared by two threads at once.
+
+        When the awaiting task is cancelled, the import stops right after the chunk being imported is committed and
+        the cancellation is propagated once the worker thread is done; the chunks committed so far are kept and a
+        later import of the same file resumes after them.
+
+        Example:
+            import asyncio
+            import BiblioAlly.wos as wos
+
+            added, loaded, total = asyncio.run(catalog.import_from_file_async(
+                wos.WebOfScience, '.\\WoS\\huge.bib', progress=lambda p: print(f'{p.entries} entries read')))
+        """
+
+        return await self._run_in_worker(self.import_from_file, progress, source, filename, parser, bulk=bulk,
+                                         chunk_size=chunk_size, resume=resume, incremental=incremental)
+
+    def import_from_files(self, sources, workers=None, parser=None, bulk=False):
+        """
+        Imports references from many files at once, parsing and translating them in parallel.
+
+        Parameters:
+            sources :
+                a list of (source, filename) pairs, each one as the parameters of import_from_file().
+            workers : (optional)
+                the number of worker processes; default is the number of processors of the machine.
+            parser : (optional)
+                the identifier of the parser backend that reads the .bib files; default is the memory-mapped scanner.
+            bulk : (optional)
+                with True, documents are written with bulk INSERT statements under the PROFILE_BULK_IMPORT
+                connection profile, as in import_from_file().
+
+        Returns:
+            a list with one (added, loaded, total) tuple per file, in the same order as sources, with the very same
+            counts a sequence of import_from_file() calls would report.
+
+        Files are parsed and translated by a pool of worker processes, which send back plain records. Duplicate
+        detection and persistence happen in this process, file by file in the order given, inside one single
+        transaction: if any file fails, nothing is imported. Catalog.import_statistics adds up the parse cache hits
+        and misses of all the files.
+
+        Example:
+            import BiblioAlly.scopus as scopus
+            import BiblioAlly.wos as wos
+            counts = catalog.import_from_files([(scopus.Scopus, '.\\Scopus\\refs.bib'),
+                                                (wos.WebOfScience, '.\\WoS\\refs.bib')], workers=4)
+        """
+
+        counts = []
+        all_statistics = []
+        keyword_normalizer = bibtex.KeywordNormalizer()
+        previous_profile = self._profile
+        if bulk:
+            self.use_profile(PROFILE_BULK_IMPORT)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for source, filename in sources:
+                translator_class = Catalog.translators.get(source)
+                if translator_class is None or (parser is not None and parser not in translator_class.parsers):
+                    futures.append(None)
+                else:
+                    futures.append((translator_class,
+                                    executor.submit(_records_from_file, translator_class, filename, parser)))
+            try:
+                for future in futures:
+                    if future is None:
+                        counts.append((0, 0, 0))
+                        continue
+                    translator_class, (records, statistics) = future[0], future[1].result()
+                    all_statistics.append(statistics)
+                    loaded_documents = [translator_class.document_from_record(record, keyword_normalizer)
+                                        for record in records]
+                    added_count, _ = self._import_documents(loaded_documents, bulk)
+                    total_count = self._session.query(domain.Document).count()
+                    counts.append((added_count, len(loaded_documents), total_count))
+            except BaseException:
+                self._session.rollback()
+                raise
+            finally:
+                self.use_profile(previous_profile)
+        self._session.commit()
+        self._report_import_statistics(bibtex.merged_cache_statistics(all_statistics))
+        return counts
+
+    def export_to_file(self, target: str, filename: str, should_export=None, progress=None):
         """
         Exports references to a file.
 
@@ -349,6 +678,8 @@ class Catalog:
                 the file name of the .bib file to be imported.
             should_export :
                 a function or lambda that receives one Document and should return True if it is to be exported.
+            progress : (optional)
+                a callable that receives an ExportProgress after each EXPORT_CHUNK_SIZE documents are written.
 
         Returns:
             the amount of documents exported.
@@ -360,6 +691,8 @@ class Catalog:
             3. Scopus: Translator for Scopus BibTeX files.
             4. WebOfScience: Translator for Web of Science BibTeX files.
 
+        If the export fails or is interrupted, the partially written file is removed.
+
         Example:
             import BiblioAlly.catalog as ally
             import BiblioAlly.domain as domain
@@ -371,19 +704,61 @@ class Catalog:
 
         if target not in Catalog.translators:
             return 0
+        start = time.perf_counter()
         translator_class = Catalog.translators[target]
         translator = translator_class()
-        loaded_documents = self.documents_by()
+        loaded_documents = self.documents_by(load=LOAD_EXPORT)
         if should_export is not None:
             exported_documents = [d for d in loaded_documents if should_export(d)]
         else:
             exported_documents = [d for d in loaded_documents]
         exported_documents.sort(key=lambda d: d.title)
-        bibtex = translator.bibtext_from_documents(exported_documents)
-        with open(filename, "w", encoding="utf-8") as texFile:
-            texFile.write(bibtex)
+        try:
+            with open(filename, "w", encoding="utf-8") as texFile:
+                for first in range(0, len(exported_documents), EXPORT_CHUNK_SIZE):
+                    chunk = exported_documents[first:first + EXPORT_CHUNK_SIZE]
+                    if first > 0:
+                        texFile.write('\n')
+                    texFile.write(translator.bibtext_from_documents(chunk))
+                    if progress is not None:
+                        progress(ExportProgress(len(exported_documents), first + len(chunk),
+                                                time.perf_counter() - start))
+        except BaseException:
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
         return len(exported_documents)
 
+    async def export_to_file_async(self, target: str, filename: str, should_export=None, progress=None):
+        """
+        Exports references to a file without blocking the running event loop.
+
+        Parameters:
+            target :
+                the identifier of the BibTex dialect.
+            filename :
+                the file name of the .bib file to be exported.
+            should_export :
+                a function or lambda that receives one Document and should return True if it is to be exported; it
+                is called in the worker thread of the catalog.
+            progress : (optional)
+                a callable that receives an ExportProgress after each EXPORT_CHUNK_SIZE documents are written; it is
+                called in the event loop.
+
+        Returns:
+            the amount of documents exported.
+
+        The export is the one of export_to_file(), run in the worker thread of the catalog (see
+        import_from_file_async()). When the awaiting task is cancelled, the export stops before writing the next
+        chunk of documents and the partially written file is removed.
+
+        Example:
+            import BiblioAlly.wos as wos
+            total = await catalog.export_to_file_async(wos.WebOfScience, '.\\WoS\\refs.bib')
+        """
+
+        return await self._run_in_worker(self.export_to_file, progress, target, filename, should_export)
+
     def close(self):
         """
         Closes the catalog, not allowing any other operations anymore.
@@ -391,9 +766,16 @@ class Catalog:
         The catalog will report False in is_open property.
         """
 
+        if self._worker is not None:
+            self._worker.shutdown()
+            self._worker = None
+        if self._session is not None:
+            self._session.close()
+            self._engine.dispose()
         self._session = None
         self._engine = None
         self._system_tags = []
+        self._tag_ids_by_name = dict()
 
     def commit(self):
         """
@@ -405,16 +787,34 @@ class Catalog:
         if self.is_open:
             self._session.commit()
 
-    def open(self, catalog_path: str, echo=True, future=True):
+    def open(self, catalog_path: str, echo=True, future=True, profile=PROFILE_SAFE):
         """
         Opens the catalog and gets ready for operations.
 
+        Parameters:
+            catalog_path: the path and file name of the catalog file;
+            echo: with True all the SQL operations issued against SQLite will be echoed to the console;
+            future: just passed to the SQLite engine;
+            profile: the name of the connection profile, one of Catalog.profiles; default is PROFILE_SAFE.
+
         The catalog will report True in is_open property.
+
+        A catalog created by a former version of BiblioAlly has its schema brought up to date: the schema migrations
+        it has not gone through yet are applied in order, each one in its own transaction, and recorded in
+        Schema_Version.
+
+        Example:
+            catalog = Catalog()
+            catalog.open('my_research.db', echo=False, profile=PROFILE_INTERACTIVE)
         """
 
+        self.use_profile(profile)
         self._engine = create_engine('sqlite+pysqlite:///' + catalog_path, echo=echo, future=future)
-        self._update_database(self._engine, domain.biblioally_mapper)
+        event.listen(self._engine, 'connect', self._apply_profile)
+        event.listen(self._engine, 'checkout', self._apply_profile)
+        self._searchable = self._update_database(self._engine, domain.biblioally_mapper)
         self._session = Session(self._engine)
+        event.listen(self._session, 'after_rollback', self._forget_tag_ids)
         self._system_tags = self.tags_by(system_tag=True)
         if len(self._system_tags) == 0:
             self._system_tags.append(self._tag_by_name(TAG_IMPORTED, auto_create=True))
@@ -424,6 +824,53 @@ class Catalog:
             self._system_tags.append(self._tag_by_name(TAG_SELECTED, auto_create=True))
             self._session.commit()
 
+    def search(self, query: str, tagged_as=None, untagged_as=None, limit=None, load=None, tagged_all=None,
+               tagged_any=None, untagged_any=None):
+        """
+        Full-text search for documents.
+
+        Parameters:
+            query :
+                an SQLite FTS5 query matched against the title, the abstract and the keywords of the documents, such
+                as 'transformer', 'deep NEAR learning', 'title:attention AND keywords:vision' or 'convolution*'.
+            tagged_as : (optional)
+                a name or a list of names of tags of which at least one is required to be assigned to the document;
+                the same as tagged_any.
+            untagged_as : (optional)
+                a name or a list of names of tags that are required to not be assigned to the document; the same as
+                untagged_any.
+            limit : (optional)
+                the maximum amount of documents returned; default is all of them.
+            load : (optional)
+                a list of relationship paths of Document to be loaded along with the documents, as in documents_by().
+            tagged_all, tagged_any, untagged_any : (optional)
+                names of tags the document is required to have all, any or none of, as in documents_by().
+
+        Returns:
+            a list containing the Documents, if any, that match the query, the most relevant first.
+
+        Documents are indexed by the Document_Search FTS5 table, which triggers keep up to date as documents and
+        their keywords change, with the Porter stemmer, so 'transformers' matches 'transformer'. Relevance is the
+        bm25 rank of the document, with a match in the title weighting as much as SEARCH_WEIGHTS[0] matches in the
+        abstract and one in the keywords as SEARCH_WEIGHTS[2]. A malformed query raises
+        sqlalchemy.exc.OperationalError, and a catalog opened by an SQLite build without FTS5 raises RuntimeError.
+
+        Example:
+            catalog.search('transformer', untagged_as=TAG_DUPLICATE, limit=50)
+        """
+
+        if not self._searchable:
+            raise RuntimeError('Full-text search requires an SQLite build with the FTS5 extension')
+        stm = self._document_by(tagged_as, untagged_as, tagged_all, tagged_any, untagged_any)
+        stm = stm.join(_document_search, _document_search.c.rowid == domain.Document.id)\
+            .where(literal_column('Document_Search').op('MATCH')(query))\
+            .order_by(func.bm25(literal_column('Document_Search'), *SEARCH_WEIGHTS))
+        if limit is not None:
+            stm = stm.limit(limit)
+        if load is not None:
+            stm = stm.options(*self._load_options(load))
+        return self._session.execute(stm).scalars().all()
+
     def tag(self, document: domain.Document, tags):
         """
         Tags a document.
@@ -443,6 +890,51 @@ class Catalog:
 
         return self._tag(document, tags)
 
+    def tag_counts(self, tags=None, by=None):
+        """
+        Counts the documents assigned to each tag.
+
+        Parameters:
+            tags : (optional)
+                a name or a list of names of the tags to be counted; default is all of them.
+            by : (optional)
+                the name of a Document attribute, such as 'year', 'generator' or 'kind', by which the counts are
+                broken down.
+
+        Returns:
+            a dictionary with the amount of documents of each tag by its name or, when by is passed, a dictionary
+            by tag name of dictionaries with the amount of documents of the tag by value of that attribute.
+
+        The counts come from one single GROUP BY query over the tag assignments, so no document is loaded. Tags
+        assigned to no document are counted as 0, or get an empty dictionary when by is passed; names of tags that
+        do not exist are left out. A by that is not a Document column raises ValueError.
+
+        Example:
+            catalog.tag_counts([TAG_SELECTED, TAG_REJECTED])
+            catalog.tag_counts(TAG_SELECTED, by='year')[TAG_SELECTED].get(2021, 0)
+        """
+
+        if type(tags) == str:
+            tags = [tags]
+        if by is not None and by not in domain.Document.__table__.columns:
+            raise ValueError(f'Unknown document attribute: {by}')
+        tag_names = select(domain.Tag.name)
+        if tags is not None:
+            tag_names = tag_names.where(domain.Tag.name.in_(tags))
+        if by is None:
+            stm = tag_names.add_columns(func.count(domain.DocumentTag.document_id))\
+                .outerjoin(domain.DocumentTag, domain.DocumentTag.tag_id == domain.Tag.id).group_by(domain.Tag.id)
+            return dict(self._session.execute(stm).all())
+        column = domain.Document.__table__.columns[by]
+        stm = tag_names.add_columns(column, func.count())\
+            .join(domain.DocumentTag, domain.DocumentTag.tag_id == domain.Tag.id)\
+            .join(domain.Document, domain.Document.id == domain.DocumentTag.document_id)\
+            .group_by(domain.Tag.id, column)
+        counts = {name: dict() for name in self._session.execute(tag_names).scalars()}
+        for name, value, count in self._session.execute(stm):
+            counts[name][value] = count
+        return counts
+
     @staticmethod
     def untag(document, tag_name):
         """
@@ -474,6 +966,40 @@ class Catalog:
 
         return self._session is not None
 
+    @property
+    def profile(self):
+        """
+        Informs the name of the connection profile in use.
+
+        Returns:
+            One of the keys of Catalog.profiles.
+        """
+
+        return self._profile
+
+    def use_profile(self, profile):
+        """
+        Switches the connection profile in use.
+
+        Parameters:
+            profile :
+                the name of the profile, one of Catalog.profiles.
+
+        Pending operations are committed first, so the new PRAGMAs are applied as soon as the connection is used
+        again. Nothing happens if the profile is already in use.
+
+        Example:
+            catalog.use_profile(PROFILE_INTERACTIVE)
+        """
+
+        if profile not in Catalog.profiles:
+            raise ValueError(f'Unknown catalog profile: {profile}')
+        if profile == self._profile:
+            return
+        if self.is_open:
+            self._session.commit()
+        self._profile = profile
+
     @property
     def system_tags(self):
         """
@@ -503,6 +1029,19 @@ class Catalog:
         document.keywords.append(the_keyword)
         return document
 
+    def _apply_profile(self, dbapi_connection, connection_record, *_):
+        # Listens to both 'connect' and 'checkout': a pooled connection keeps the PRAGMAs of the profile it was last
+        # tuned for, so they are only issued again when the catalog switched profiles in the meantime.
+        if connection_record.info.get('profile') == self._profile:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in Catalog.profiles[self._profile].items():
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+        finally:
+            cursor.close()
+        connection_record.info['profile'] = self._profile
+
     def _author_by_name(self, author_name, auto_create=True):
         existing_author = self._session.execute(select(domain.Author).filter_by(long_name=author_name))\
             .scalars().first()
@@ -512,26 +1051,345 @@ class Catalog:
                 self._session.add(existing_author)
         return existing_author
 
-    def _document_by(self, tagged_as=None, untagged_as=None, alias=None, **kwargs):
-        if alias is None:
-            stm = select(domain.Document)
-        else:
-            stm = select(alias)
+    def _document_by(self, tagged_as=None, untagged_as=None, tagged_all=None, tagged_any=None, untagged_any=None,
+                     **kwargs):
+        # Each tag filter is one condition over Document_R_Tag, by tag ID, and no table is joined, so a document is
+        # never repeated: tagged_any takes the documents found through its tag_id index, untagged_any is a NOT EXISTS
+        # lookup of its primary key, and tagged_all takes the documents that have as many of the tags as were passed.
+        stm = select(domain.Document)
         if len(kwargs) > 0:
             stm = stm.filter_by(**kwargs)
-        if tagged_as is not None or untagged_as is not None:
-            stm = stm.join(domain.DocumentTag).join(domain.Tag)
-        if tagged_as is not None:
-            if type(tagged_as) == str:
-                tagged_as = [tagged_as]
-            stm = stm.where(domain.Tag.name.in_(tagged_as))
-        if untagged_as is not None:
-            if type(untagged_as) == str:
-                untagged_as = [untagged_as]
-            doc_alias = aliased(domain.Document, name=alias)
-            stm = stm.where(~self._document_by(tagged_as=untagged_as, alias=doc_alias, id=domain.Document.id).exists())
+        for names in [tagged_as, tagged_any]:
+            if names is not None:
+                stm = stm.where(domain.Document.id.in_(
+                    select(domain.DocumentTag.document_id).where(domain.DocumentTag.tag_id.in_(self._tag_ids(names)))))
+        for names in [untagged_as, untagged_any]:
+            if names is not None:
+                stm = stm.where(~self._tag_exists(names))
+        if tagged_all is not None:
+            names = {tagged_all} if type(tagged_all) == str else set(tagged_all)
+            tag_ids = self._tag_ids(names)
+            if len(tag_ids) < len(names):
+                stm = stm.where(false())
+            elif len(tag_ids) > 0:
+                stm = stm.where(domain.Document.id.in_(
+                    select(domain.DocumentTag.document_id).where(domain.DocumentTag.tag_id.in_(tag_ids))
+                    .group_by(domain.DocumentTag.document_id).having(func.count() == len(tag_ids))))
         return stm
 
+    def _entities_by_names(self, entity, attribute, names):
+        column = getattr(entity, attribute)
+        entities = dict()
+        for start in range(0, len(names), QUERY_CHUNK_SIZE):
+            chunk = names[start:start + QUERY_CHUNK_SIZE]
+            for instance in self._session.execute(select(entity).where(column.in_(chunk)).order_by(entity.id))\
+                    .scalars():
+                entities.setdefault(getattr(instance, attribute), instance)
+        return entities
+
+    def _import_documents(self, loaded_documents, bulk=False):
+        # The full-text index triggers are deferred while the documents are persisted: indexing all of them with one
+        # statement afterwards is an order of magnitude faster than indexing them row by row.
+        if not self._searchable:
+            return self._persist_documents(loaded_documents, bulk)
+        connection = self._session.connection()
+        last_document_id = connection.execute(select(func.max(domain.Document.id))).scalar() or 0
+        connection.exec_driver_sql('UPDATE Search_Index_State SET deferred = 1')
+        try:
+            counts = self._persist_documents(loaded_documents, bulk)
+            self._session.flush()
+        finally:
+            _index_documents(connection, f'Document.id > {last_document_id}')
+            connection.exec_driver_sql('UPDATE Search_Index_State SET deferred = 0')
+        return counts
+
+    def _persist_documents(self, loaded_documents, bulk):
+        author_names = dict()
+        author_long_names = dict()
+        institution_names = dict()
+        keyword_names = dict()
+        title_fingerprints = dict()
+        dois = dict()
+        for document in loaded_documents:
+            title_fingerprints[document.title_fingerprint] = None
+            if document.doi_normalized is not None:
+                dois[document.doi_normalized] = None
+            for keyword in document.keywords:
+                keyword_names[keyword.name] = None
+            for document_author in document.authors:
+                author = document_author.author
+                long_name = author.long_name
+                author_long_names[long_name] = None
+                name = long_name if long_name != '' else author.short_name
+                if name not in author_names:
+                    author_names[name] = author
+                institution = document_author.institution
+                if institution is not None:
+                    institution_names.setdefault(institution.name, institution)
+        persisted_authors = self._entities_by_names(domain.Author, 'long_name', list(author_long_names))
+        persisted_institutions = self._entities_by_names(domain.Institution, 'name', list(institution_names))
+        persisted_keywords = self._entities_by_names(domain.Keyword, 'name', list(keyword_names))
+        originals_by_doi = self._originals_by('doi_normalized', list(dois))
+        originals = self._originals_by('title_fingerprint', list(title_fingerprints))
+        threshold = self.near_duplicate_threshold
+        if threshold is not None:
+            sketches = [self._title_sketch(document.title) for document in loaded_documents]
+            persisted_bands, persisted_titles = self._title_bands_by_keys(list(dict.fromkeys(
+                key for _, keys in sketches for key in keys)))
+            loaded_bands = dict()
+        else:
+            self._titles_indexed = False
+        imported_tag = self._tag_by_name(TAG_IMPORTED, auto_create=True)
+        duplicate_tag = self._tag_by_name(TAG_DUPLICATE, auto_create=True)
+        added_count = duplicate_count = 0
+        added_documents = []
+        added_bands = []
+        loaded_originals = []
+        session = self._session
+        for index, loaded_document in enumerate(loaded_documents):
+            fingerprint = loaded_document.title_fingerprint
+            doi = loaded_document.doi_normalized
+            original, generator = originals_by_doi.get(doi, (None, None))
+            if original is None:
+                original, generator = originals.get(fingerprint, (None, None))
+            if original is not None and generator == loaded_document.generator:
+                continue
+            if original is None and threshold is not None:
+                shingles, keys = sketches[index]
+                original, similarity = self._near_duplicate_of(loaded_document, shingles, keys, threshold,
+                                                               persisted_bands, persisted_titles, loaded_bands)
+                if original is None:
+                    added_bands.append((loaded_document, keys))
+                    for key in keys:
+                        loaded_bands.setdefault(key, []).append(
+                            (loaded_document, (shingles, doi, loaded_document.year)))
+                else:
+                    loaded_document.duplicate_similarity = similarity
+            root = loaded_document if original is None else original
+            originals.setdefault(fingerprint, (root, loaded_document.generator))
+            if doi is not None:
+                originals_by_doi.setdefault(doi, (root, loaded_document.generator))
+            if original is not None:
+                duplicate_count += 1
+            added_count += 1
+            if bulk:
+                added_documents.append((loaded_document, original, imported_tag if original is None else duplicate_tag))
+                continue
+            loaded_document.import_date = datetime.date.today()
+            self._update_authors(loaded_document, persisted_authors, author_names)
+            self._update_institutions(loaded_document, persisted_institutions, institution_names)
+            self._update_keywords(loaded_document, persisted_keywords)
+            session.add(loaded_document)
+            if original is None:
+                self._tag(loaded_document, imported_tag)
+            else:
+                self._tag(loaded_document, duplicate_tag)
+                if isinstance(original, domain.Document):
+                    loaded_originals.append((loaded_document, original))
+                else:
+                    loaded_document.original_document_id = original
+        if bulk:
+            self._insert_documents(added_documents, (persisted_authors, author_names),
+                                   (persisted_institutions, institution_names), persisted_keywords, added_bands)
+        elif len(added_bands) > 0 or len(loaded_originals) > 0:
+            # Duplicates of documents of the same batch are linked once all of them have their IDs: linking them
+            # through Document.duplicates would have the flush sort the self-referential inserts, and the IDs would
+            # no longer follow the file order.
+            session.flush()
+            for loaded_document, original in loaded_originals:
+                loaded_document.original_document_id = original.id
+            if len(added_bands) > 0:
+                session.execute(insert(domain.TitleBand), [{'key': key, 'document_id': document.id}
+                                                           for document, keys in added_bands for key in keys])
+        return added_count, duplicate_count
+
+    def _import_file_incrementally(self, source, translator, filename, bulk, progress):
+        start = time.perf_counter()
+        session = self._session
+        path = os.path.abspath(filename)
+        size = os.path.getsize(path)
+        file_digest = scanner.file_digest(path)
+        manifest = session.execute(select(domain.ImportSource).filter_by(path=path)).scalars().first()
+        if manifest is not None and (manifest.source, manifest.size, manifest.digest) == (source, size, file_digest):
+            if progress is not None:
+                progress(ImportProgress(manifest.entries, 0, 0, time.perf_counter() - start))
+            return 0, manifest.entries, session.query(domain.Document).count()
+        entry_digests = scanner.entry_digests(path)
+        new_spans = dict()
+        for digest, entry_start, entry_end in entry_digests:
+            new_spans.setdefault(digest, (entry_start, entry_end))
+        digests = list(new_spans)
+        for chunk_start in range(0, len(digests), QUERY_CHUNK_SIZE):
+            for digest in session.execute(select(domain.ImportedEntry.digest).where(
+                    domain.ImportedEntry.source == source,
+                    domain.ImportedEntry.digest.in_(digests[chunk_start:chunk_start + QUERY_CHUNK_SIZE]))).scalars():
+                del new_spans[digest]
+        loaded_documents = translator.documents_from_proto_documents(
+            scanner.proto_documents_from_mapped_spans(path, list(new_spans.values())))
+        self._report_import_statistics(translator.cache_statistics)
+        added_count = duplicate_count = 0
+        previous_profile = self._profile
+        if bulk:
+            self.use_profile(PROFILE_BULK_IMPORT)
+        try:
+            added_count, duplicate_count = self._import_documents(loaded_documents, bulk)
+            today = datetime.date.today()
+            if len(new_spans) > 0:
+                session.execute(insert(domain.ImportedEntry), [{'digest': digest, 'source': source,
+                                                                'import_date': today} for digest in new_spans])
+            if manifest is None:
+                manifest = domain.ImportSource(path=path)
+                session.add(manifest)
+            manifest.source, manifest.size, manifest.digest = source, size, file_digest
+            manifest.entries, manifest.import_date = len(entry_digests), today
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            self.use_profile(previous_profile)
+        if progress is not None:
+            progress(ImportProgress(len(entry_digests), added_count, duplicate_count, time.perf_counter() - start))
+        return added_count, len(entry_digests), session.query(domain.Document).count()
+
+    def _import_file_in_chunks(self, source, translator, filename, parser, bulk, chunk_size, progress, resume):
+        start = time.perf_counter()
+        session = self._session
+        path = os.path.abspath(filename)
+        file_status = os.stat(path)
+        checkpoint = session.execute(select(domain.ImportCheckpoint).filter_by(path=path)).scalars().first()
+        if checkpoint is not None and (not resume or checkpoint.source != source or
+                                       checkpoint.size != file_status.st_size or
+                                       checkpoint.modified != file_status.st_mtime_ns):
+            session.delete(checkpoint)
+            session.flush()
+            checkpoint = None
+        if checkpoint is None:
+            checkpoint = domain.ImportCheckpoint(path=path, source=source, size=file_status.st_size,
+                                                 modified=file_status.st_mtime_ns, entries=0, added=0, duplicates=0,
+                                                 import_date=datetime.date.today())
+            session.add(checkpoint)
+        entry_count, added_count, duplicate_count = checkpoint.entries, checkpoint.added, checkpoint.duplicates
+        if entry_count > 0:
+            _logger.info('Resuming the import of %s after %d entries', path, entry_count)
+        previous_profile = self._profile
+        if bulk:
+            self.use_profile(PROFILE_BULK_IMPORT)
+        try:
+            loaded_documents = translator.iter_documents_from_file(filename, parser, start=entry_count)
+            while True:
+                # The canonical keywords of the former chunk are expired by its commit, and would be reloaded one by
+                # one; a new normalizer lets the keywords already persisted be resolved by name, as a whole chunk.
+                translator.keyword_normalizer = bibtex.KeywordNormalizer()
+                chunk = list(islice(loaded_documents, chunk_size))
+                if len(chunk) == 0:
+                    break
+                chunk_added_count, chunk_duplicate_count = self._import_documents(chunk, bulk)
+                entry_count += len(chunk)
+                added_count += chunk_added_count
+                duplicate_count += chunk_duplicate_count
+                checkpoint.entries, checkpoint.added, checkpoint.duplicates = entry_count, added_count, duplicate_count
+                session.commit()
+                for document in chunk:
+                    if document in session:
+                        session.expunge(document)
+                if progress is not None:
+                    progress(ImportProgress(entry_count, added_count, duplicate_count, time.perf_counter() - start))
+            if checkpoint in session.new:
+                session.expunge(checkpoint)
+            else:
+                session.delete(checkpoint)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            self.use_profile(previous_profile)
+        self._report_import_statistics(translator.cache_statistics)
+        return added_count, entry_count, session.query(domain.Document).count()
+
+    def _insert_documents(self, added_documents, authors, institutions, persisted_keywords, added_bands):
+        # Writes the documents with Core executemany statements, resolving authors, institutions and keywords just
+        # like _update_authors(), _update_institutions() and _update_keywords() do, but reading the instance
+        # dictionaries directly: going through the ORM attributes would cost more than the INSERTs themselves.
+        session = self._session
+        session.flush()
+        today = datetime.date.today()
+        persisted_authors, author_names = authors
+        persisted_institutions, institution_names = institutions
+        next_ids = dict()
+        for entity in [domain.Document, domain.Author, domain.Institution, domain.Keyword]:
+            next_ids[entity] = (session.execute(select(func.max(entity.id))).scalar() or 0) + 1
+        new_ids = dict()
+        rows = {table: [] for table in [domain.Document.__table__, domain.Author.__table__,
+                                        domain.Institution.__table__, domain.Keyword.__table__,
+                                        domain.DocumentAuthor.__table__, domain.Document_Keyword,
+                                        domain.DocumentTag.__table__]}
+
+        def id_of(instance, row):
+            instance_id = new_ids.get(id(instance))
+            if instance_id is None:
+                instance_id = instance.__dict__.get('id')
+                if instance_id is None:
+                    entity = type(instance)
+                    instance_id = next_ids[entity]
+                    next_ids[entity] += 1
+                    new_ids[id(instance)] = instance_id
+                    row['id'] = instance_id
+                    rows[entity.__table__].append(row)
+            return instance_id
+
+        document_columns = [column.key for column in domain.Document.__table__.columns]
+        for document, original, tag in added_documents:
+            if isinstance(original, domain.Document):
+                original = new_ids[id(original)]
+            values = document.__dict__
+            row = {name: values.get(name) for name in document_columns}
+            row['original_document_id'] = original
+            row['import_date'] = today
+            document_id = id_of(document, row)
+            for document_author in values.get('authors', []):
+                author = document_author.__dict__['author']
+                author_values = author.__dict__
+                existing_author = persisted_authors.get(author_values['long_name'])
+                if existing_author is None:
+                    name = author_values['long_name'] if author_values['long_name'] != '' \
+                        else author_values['short_name']
+                    if name in author_names:
+                        existing_author = author_names[author_values['long_name']]
+                if existing_author is not None:
+                    author = existing_author
+                    author_values = author.__dict__
+                author_id = id_of(author, {'short_name': author_values['short_name'],
+                                           'long_name': author_values['long_name']})
+                institution_id = None
+                institution = document_author.__dict__.get('institution')
+                if institution is not None:
+                    name = institution.__dict__['name']
+                    existing_institution = persisted_institutions.get(name)
+                    if existing_institution is None:
+                        existing_institution = institution_names.get(name)
+                    if existing_institution is not None:
+                        institution = existing_institution
+                    institution_id = id_of(institution, {'name': institution.__dict__['name'],
+                                                         'country': institution.__dict__.get('country'),
+                                                         'import_date': today})
+                rows[domain.DocumentAuthor.__table__].append({'document_id': document_id, 'author_id': author_id,
+                                                             'first': document_author.__dict__.get('first'),
+                                                             'institution_id': institution_id})
+            for keyword in values.get('keywords', []):
+                keyword = persisted_keywords.get(keyword.__dict__['name'], keyword)
+                keyword_id = id_of(keyword, {'name': keyword.__dict__['name'],
+                                             'import_date': keyword.__dict__.get('import_date') or today})
+                rows[domain.Document_Keyword].append({'document_id': document_id, 'keyword_id': keyword_id})
+            rows[domain.DocumentTag.__table__].append({'document_id': document_id, 'tag_id': tag.id})
+        rows[domain.TitleBand.__table__] = [{'key': key, 'document_id': new_ids[id(document)]}
+                                            for document, keys in added_bands for key in keys]
+        with session.no_autoflush:
+            for table, table_rows in rows.items():
+                if len(table_rows) > 0:
+                    session.execute(insert(table), table_rows)
+
     def _institution_by_name(self, institution_name, auto_create=True):
         existing_institution = self._session.execute(select(domain.Institution).filter_by(name=institution_name))\
             .scalars().first()
@@ -549,6 +1407,122 @@ class Catalog:
                 self._session.add(existing_keyword)
         return existing_keyword
 
+    @staticmethod
+    def _load_options(load):
+        # Collections are loaded by selectinload(), with one query per batch of documents, and the entities they
+        # refer to are joined to that query by joinedload().
+        options = []
+        for path in load:
+            entity = domain.Document
+            option = None
+            for name in path.split('.'):
+                attribute = getattr(entity, name)
+                loader = selectinload if attribute.property.uselist else joinedload
+                option = loader(attribute) if option is None else getattr(option, loader.__name__)(attribute)
+                entity = attribute.property.mapper.class_
+            options.append(option)
+        return options
+
+    def _near_duplicate_of(self, document, shingles, keys, threshold, persisted_bands, persisted_titles,
+                           loaded_bands):
+        # Similar titles are not enough when the records tell otherwise: documents with different DOIs, or published
+        # more than NEAR_DUPLICATE_YEAR_GAP years apart, are different papers.
+        best_original, best_similarity = None, threshold
+        candidates = [(document_id, persisted_titles[document_id]) for document_id in dict.fromkeys(
+            document_id for key in keys for document_id in persisted_bands.get(key, []))]
+        candidates += {id(candidate): (candidate, title) for key in keys
+                       for candidate, title in loaded_bands.get(key, [])}.values()
+        for candidate, (candidate_shingles, doi, year) in candidates:
+            if document.doi_normalized is not None and doi is not None and document.doi_normalized != doi:
+                continue
+            if document.year is not None and year is not None and abs(document.year - year) > NEAR_DUPLICATE_YEAR_GAP:
+                continue
+            similarity = TitleMinHash.similarity(shingles, candidate_shingles)
+            if similarity >= best_similarity and (best_original is None or similarity > best_similarity):
+                best_original, best_similarity = candidate, similarity
+        return best_original, (best_similarity if best_original is not None else None)
+
+    def _originals_by(self, attribute, values):
+        # Maps each value to the first document holding it, or to that document's original when it is a duplicate,
+        # along with the generator of the document holding it.
+        column = getattr(domain.Document, attribute)
+        originals = dict()
+        for start in range(0, len(values), QUERY_CHUNK_SIZE):
+            chunk = values[start:start + QUERY_CHUNK_SIZE]
+            for document_id, value, generator, original_document_id in self._session.execute(
+                    select(domain.Document.id, column, domain.Document.generator,
+                           domain.Document.original_document_id)
+                    .where(column.in_(chunk)).order_by(domain.Document.id)):
+                if value not in originals:
+                    originals[value] = (document_id if original_document_id is None else original_document_id,
+                                        generator)
+        return originals
+
+    def _report_import_statistics(self, statistics):
+        self.import_statistics = statistics
+        for name, cache_statistics in statistics.items():
+            _logger.info('%s cache: %d hits, %d misses (%.1f%% hit rate)', name, cache_statistics.hits,
+                         cache_statistics.misses, 100 * cache_statistics.hit_rate)
+
+    async def _run_in_worker(self, function, progress, *args, **kwargs):
+        # Runs function in the worker thread of the catalog, handing it a progress callback that forwards each report
+        # to the event loop and, once the awaiting task is cancelled, interrupts the function at its next report.
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def report(status):
+            if cancelled.is_set():
+                raise asyncio.CancelledError()
+            if progress is not None:
+                loop.call_soon_threadsafe(progress, status)
+
+        if self._worker is None:
+            self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='BiblioAlly')
+        work = loop.run_in_executor(self._worker, partial(function, *args, progress=report, **kwargs))
+        try:
+            return await asyncio.shield(work)
+        except asyncio.CancelledError:
+            cancelled.set()
+            await asyncio.wait([work])
+            if not work.cancelled():
+                work.exception()
+            raise
+
+    def _title_bands_by_keys(self, keys):
+        # The documents imported before the index existed are indexed first, once per catalog instance.
+        session = self._session
+        if not self._titles_indexed:
+            unindexed = select(domain.Document.id, domain.Document.title).where(
+                domain.Document.original_document_id.is_(None),
+                ~exists().where(domain.TitleBand.document_id == domain.Document.id))
+            rows = [{'key': key, 'document_id': document_id} for document_id, title in session.execute(unindexed)
+                    for key in self._title_sketch(title)[1]]
+            if len(rows) > 0:
+                session.execute(insert(domain.TitleBand), rows)
+            self._titles_indexed = True
+        bands = dict()
+        for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+            for key, document_id in session.execute(
+                    select(domain.TitleBand.key, domain.TitleBand.document_id)
+                    .where(domain.TitleBand.key.in_(keys[start:start + QUERY_CHUNK_SIZE]))
+                    .order_by(domain.TitleBand.document_id)):
+                bands.setdefault(key, []).append(document_id)
+        document_ids = list(dict.fromkeys(document_id for document_ids in bands.values()
+                                          for document_id in document_ids))
+        titles = dict()
+        for start in range(0, len(document_ids), QUERY_CHUNK_SIZE):
+            for document_id, title, doi, year in session.execute(
+                    select(domain.Document.id, domain.Document.title, domain.Document.doi_normalized,
+                           domain.Document.year)
+                    .where(domain.Document.id.in_(document_ids[start:start + QUERY_CHUNK_SIZE]))):
+                titles[document_id] = (_title_min_hash.shingles(title), doi, year)
+        return bands, titles
+
+    @staticmethod
+    def _title_sketch(title):
+        shingles = _title_min_hash.shingles(title)
+        return shingles, _title_min_hash.band_keys(shingles)
+
     def _tag(self, document, tags):
         if type(tags) is not list:
             tags = [tags]
@@ -572,13 +1546,48 @@ class Catalog:
                 self._session.add(existing_tag)
         return existing_tag
 
+    def _tag_exists(self, names):
+        return exists().where(domain.DocumentTag.document_id == domain.Document.id,
+                              domain.DocumentTag.tag_id.in_(self._tag_ids(names)))
+
+    def _forget_tag_ids(self, session):
+        # A rolled back tag loses its ID, which SQLite may give to the next tag created.
+        self._tag_ids_by_name = dict()
+
+    def _tag_ids(self, names):
+        # Tag IDs are cached by name; names not found are looked up again next time, as the tag may be created.
+        names = [names] if type(names) == str else names
+        missing_names = [name for name in names if name not in self._tag_ids_by_name]
+        if len(missing_names) > 0:
+            self._tag_ids_by_name.update(self._session.execute(
+                select(domain.Tag.name, domain.Tag.id).where(domain.Tag.name.in_(missing_names))).all())
+        return [self._tag_ids_by_name[name] for name in names if name in self._tag_ids_by_name]
+
     @staticmethod
     def _update_database(engine, mapper):
+        # Creates the missing tables, then brings the existing ones up to date by running the migrations of
+        # _schema_migrations newer than the version recorded in Schema_Version, in order and each one in its own
+        # transaction. Catalogs created before Schema_Version existed run all of them, as new catalogs do, so every
+        # migration must also work on a schema that is already up to date. Returns whether the catalog keeps the
+        # Document_Search full-text index up to date, which SQLite builds without FTS5 cannot do.
         mapper.metadata.create_all(engine)
+        for version, description, migration in _schema_migrations:
+            with engine.begin() as connection:
+                current_version = connection.execute(select(func.max(domain.SchemaVersion.version))).scalar()
+                if current_version is not None and current_version >= version:
+                    continue
+                migration(connection, mapper.metadata)
+                connection.execute(insert(domain.SchemaVersion.__table__).values(
+                    version=version, description=description, migration_date=datetime.date.today()))
+            _logger.info('Catalog schema migrated to version %d: %s', version, description)
+        with engine.begin() as connection:
+            _create_search_index(connection, mapper.metadata)
+            return _has_search_triggers(connection)
 
-    def _update_authors(self, document, author_names):
+    @staticmethod
+    def _update_authors(document, persisted_authors, author_names):
         for author in document.authors:
-            existing_author = self._author_by_name(author.author.long_name, auto_create=False)
+            existing_author = persisted_authors.get(author.author.long_name)
             if existing_author is None:
                 if author.author.name in author_names:
                     existing_author = author_names[author.author.long_name]
@@ -588,11 +1597,12 @@ class Catalog:
             else:
                 author.author.import_date = datetime.date.today()
 
-    def _update_institutions(self, document, institution_names):
+    @staticmethod
+    def _update_institutions(document, persisted_institutions, institution_names):
         for author in document.authors:
             if author.institution is None:
                 continue
-            institution = self._institution_by_name(author.institution.name, auto_create=False)
+            institution = persisted_institutions.get(author.institution.name)
             if institution is None:
                 if author.institution.name in institution_names:
                     institution = institution_names[author.institution.name]
@@ -603,17 +1613,180 @@ class Catalog:
                 if author.institution is not None:
                     author.institution.import_date = datetime.date.today()
 
-    def _update_keywords(self, document):
-        index = 0
-        while index < len(document.keywords):
-            new_keyword = document.keywords[index]
-            keyword = self._keyword_by_name(new_keyword.name, auto_create=False)
-            if keyword is not None:
-                document.keywords.remove(document.keywords[index])
-                document.keywords.insert(index, keyword)
-            else:
-                new_keyword.import_date = datetime.date.today()
-            index += 1
+    @staticmethod
+    def _update_keywords(document, persisted_keywords):
+        keywords = []
+        for keyword in document.keywords:
+            persisted_keyword = persisted_keywords.get(keyword.name)
+            if persisted_keyword is not None:
+                keyword = persisted_keyword
+            elif keyword.import_date is None:
+                keyword.import_date = datetime.date.today()
+            keywords.append(keyword)
+        document.keywords = keywords
+
+
+def _backfill_normalized_dois(connection):
+    table = domain.Document.__table__
+    rows = []
+    for document_id, doi in connection.execute(select(table.c.id, table.c.doi).where(table.c.doi.is_not(None))):
+        doi = normalized_doi(doi)
+        if doi is not None:
+            rows.append({'document_id': document_id, 'normalized_doi': doi})
+    if len(rows) > 0:
+        connection.execute(update(table).where(table.c.id == bindparam('document_id'))
+                           .values(doi_normalized=bindparam('normalized_doi')), rows)
+
+
+def _backfill_title_fingerprints(connection):
+    table = domain.Document.__table__
+    rows = [{'document_id': document_id, 'fingerprint': title_fingerprint(title)}
+            for document_id, title in connection.execute(select(table.c.id, table.c.title))]
+    if len(rows) > 0:
+        connection.execute(update(table).where(table.c.id == bindparam('document_id'))
+                           .values(title_fingerprint=bindparam('fingerprint')), rows)
+
+
+_column_backfills = {
+    ('Document', 'doi_normalized'): _backfill_normalized_dois,
+    ('Document', 'title_fingerprint'): _backfill_title_fingerprints,
+}
+
+
+# The keywords of a document, as indexed by Document_Search.
+_document_keywords = "SELECT coalesce(group_concat(Keyword.name, ' '), '') FROM Keyword " \
+                     'JOIN Document_R_Keyword ON Document_R_Keyword.keyword_id = Keyword.id ' \
+                     'WHERE Document_R_Keyword.document_id = {document_id}'
+# Imports set Search_Index_State.deferred inside their own transaction, so the insert triggers let them index the
+# new documents in bulk.
+_search_index_not_deferred = 'WHEN NOT (SELECT deferred FROM Search_Index_State)'
+_search_index_ddl = [
+    "CREATE VIRTUAL TABLE Document_Search USING fts5(title, abstract, keywords, "
+    "tokenize = 'porter unicode61 remove_diacritics 2')",
+    'CREATE TABLE IF NOT EXISTS Search_Index_State (deferred BOOLEAN NOT NULL)',
+    'DELETE FROM Search_Index_State',
+    'INSERT INTO Search_Index_State (deferred) VALUES (0)',
+    f'CREATE TRIGGER IF NOT EXISTS Document_Search_Insert AFTER INSERT ON Document {_search_index_not_deferred} BEGIN '
+    "INSERT INTO Document_Search (rowid, title, abstract, keywords) VALUES (new.id, new.title, new.abstract, ''); "
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS Document_Search_Update AFTER UPDATE OF title, abstract ON Document BEGIN '
+    'UPDATE Document_Search SET title = new.title, abstract = new.abstract WHERE rowid = new.id; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS Document_Search_Delete AFTER DELETE ON Document BEGIN '
+    'DELETE FROM Document_Search WHERE rowid = old.id; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS Document_Search_Keyword_Insert AFTER INSERT ON Document_R_Keyword '
+    f'{_search_index_not_deferred} BEGIN '
+    f'UPDATE Document_Search SET keywords = ({_document_keywords.format(document_id="new.document_id")}) '
+    'WHERE rowid = new.document_id; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS Document_Search_Keyword_Delete AFTER DELETE ON Document_R_Keyword BEGIN '
+    f'UPDATE Document_Search SET keywords = ({_document_keywords.format(document_id="old.document_id")}) '
+    'WHERE rowid = old.document_id; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS Document_Search_Keyword_Update AFTER UPDATE OF name ON Keyword BEGIN '
+    f'UPDATE Document_Search SET keywords = ({_document_keywords.format(document_id="Document_Search.rowid")}) '
+    'WHERE rowid IN (SELECT document_id FROM Document_R_Keyword WHERE keyword_id = new.id); '
+    'END',
+]
+_search_index_triggers = ['Document_Search_Insert', 'Document_Search_Update', 'Document_Search_Delete',
+                          'Document_Search_Keyword_Insert', 'Document_Search_Keyword_Delete',
+                          'Document_Search_Keyword_Update']
+
+
+# Title_Band is kept in step with Document the way Document_Search is, so a deleted document is never a candidate
+# original of near-duplicates.
+_title_band_ddl = [
+    'CREATE TRIGGER IF NOT EXISTS Title_Band_Document_Delete AFTER DELETE ON Document BEGIN '
+    'DELETE FROM Title_Band WHERE document_id = old.id; '
+    'END',
+    'DELETE FROM Title_Band WHERE document_id NOT IN (SELECT id FROM Document)',
+]
+
+
+def _index_documents(connection, condition):
+    connection.exec_driver_sql(
+        'INSERT INTO Document_Search (rowid, title, abstract, keywords) '
+        'SELECT Document.id, Document.title, Document.abstract, '
+        f'({_document_keywords.format(document_id="Document.id")}) FROM Document WHERE {condition}')
+
+
+def _add_declared_columns(connection, metadata):
+    # New columns are always nullable, so SQLite can add them in place; those derived from other columns are
+    # backfilled right away by the functions in _column_backfills.
+    for table in metadata.sorted_tables:
+        existing_columns = {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN '
+                                           f'{CreateColumn(column).compile(dialect=connection.dialect)}')
+                backfill = _column_backfills.get((table.name, column.name))
+                if backfill is not None:
+                    backfill(connection)
+
+
+def _create_declared_indexes(connection, metadata):
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _has_search_index(connection):
+    return connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'Document_Search'").first() is not None
+
+
+def _has_search_triggers(connection):
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'Document_Search_Insert'").first() is not None
+
+
+def _supports_fts5(connection):
+    try:
+        connection.exec_driver_sql('CREATE VIRTUAL TABLE temp.FTS5_Probe USING fts5(content)')
+    except OperationalError:
+        return False
+    connection.exec_driver_sql('DROP TABLE temp.FTS5_Probe')
+    return True
+
+
+def _create_search_index(connection, _):
+    # SQLite builds without FTS5 leave the catalog without the index, so only search() is unavailable. The triggers of
+    # an index created by another build are dropped, as they would make every change to Document fail, and the stale
+    # index is built again from scratch once the catalog is opened by a build that has FTS5.
+    if not _supports_fts5(connection):
+        for trigger in _search_index_triggers:
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {trigger}')
+        _logger.warning('SQLite was built without FTS5: full-text search is not available')
+        return
+    if _has_search_index(connection):
+        if _has_search_triggers(connection):
+            return
+        connection.exec_driver_sql('DROP TABLE Document_Search')
+    for statement in _search_index_ddl:
+        connection.exec_driver_sql(statement)
+    _index_documents(connection, '1')
+
+
+def _create_title_band_trigger(connection, _):
+    for statement in _title_band_ddl:
+        connection.exec_driver_sql(statement)
+
+
+# The migrations of the schema of existing catalogs, as (version, description, migration function) in the order they
+# are applied; a change to a table already released must come with a new migration appended here.
+_schema_migrations = [
+    (1, 'Add the duplicate detection columns of Document', _add_declared_columns),
+    (2, 'Add the Document_Search full-text index', _create_search_index),
+    (3, 'Index author and institution names, DOIs, years and the authors and tags of documents',
+     _create_declared_indexes),
+    (4, 'Delete the title bands of deleted documents', _create_title_band_trigger),
+]
+
+
+def _records_from_file(translator_class, filename, parser):
+    translator = translator_class()
+    documents = translator.documents_from_file(filename, parser)
+    return [translator.record_from_document(document) for document in documents], translator.cache_statistics
 
 
 all_document_fields = [
@@ -629,7 +1802,8 @@ def as_dict(documents, fields=None, **kwargs):
 
     Parameters:
         documents:
-            the of documents to be operated;
+            the list of documents to be operated, one single document or any iterable of them, such as the iterator
+            returned by Catalog.iter_documents_by();
         fields:
             the list of fields that will be translated; if None is passed, all fields will be translated;
         **kwargs:
@@ -647,7 +1821,7 @@ def as_dict(documents, fields=None, **kwargs):
                                           tags=lambda tags: [t.tag.name for t in tags])
     """
 
-    if type(documents) is not list:
+    if isinstance(documents, domain.Document):
         documents = [documents]
     if fields is None:
         fields = all_document_fields
@@ -670,7 +1844,8 @@ def as_tuple(documents, fields=None, **kwargs):
 
     Parameters:
         documents:
-            the of documents to be operated;
+            the list of documents to be operated, one single document or any iterable of them, such as the iterator
+            returned by Catalog.iter_documents_by();
         fields:
             the list of fields that will be translated; if None is passed, all fields will be translated;
         **kwargs:
@@ -686,7 +1861,7 @@ def as_tuple(documents, fields=None, **kwargs):
                                            tags=lambda tags: [t.tag.name for t in tags])
     """
 
-    if type(documents) is not list:
+    if isinstance(documents, domain.Document):
         documents = [documents]
     if fields is None:
         fields = all_document_fields
@@ -6,7 +6,7 @@ ORM engine used to persist and retrieve the objects during a session of BiblioAl
 """
 
 import datetime
-from sqlalchemy import Table, ForeignKey, Column, Integer, String, Date, Boolean, Text
+from sqlalchemy import Table, ForeignKey, Column, Integer, String, Date, Boolean, Text, Float
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import registry, relationship, backref
 
@@ -28,7 +28,7 @@ class Author(Base):
     __tablename__ = 'Author'
     id = Column(Integer, primary_key=True)
     short_name = Column(String(30), nullable=False, index=True)
-    long_name = Column(String(255))
+    long_name = Column(String(255), index=True)
 
     def __init__(self, short_name, long_name=None):
         Base.__init__(self)
@@ -69,15 +69,23 @@ class Document(Base):
         -zero or more References to other scientific documents used to fundament the research;
         -one or more Tags that somehow register some particular condition fo interest;
         -zero or one DocumentMetadata that record the important data extracted from the document full text.
+
+    Titles are compared by title_fingerprint, a 64-bit digest of the normalized title; title_crc32 is still kept up
+    to date for the catalogs and tools that read it.
+
+    A Document found to be a duplicate of another one is linked to it as one of its duplicates; duplicate_similarity
+    holds the similarity of their titles, from 0.0 to 1.0, when they are near-duplicates, and None when their titles
+    are the same.
     """
 
     __tablename__ = 'Document'
     id = Column(Integer, primary_key=True)
     title = Column(String(255, collation='NOCASE'), nullable=False)
     title_crc32 = Column(Integer, nullable=False, index=True)
+    title_fingerprint = Column(Integer, index=True)
     abstract = Column(String, nullable=False)
     external_key = Column(String(128), nullable=False, index=True)
-    year = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False, index=True)
     kind = Column(String(255), nullable=False)
     journal = Column(String(255))
     publisher = Column(String(64))
@@ -85,7 +93,8 @@ class Document(Base):
     pages = Column(String(30))
     volume = Column(String(30))
     number = Column(String(30))
-    doi = Column(String(128))
+    doi = Column(String(128), index=True)
+    doi_normalized = Column(String(128), index=True)
     international_number = Column(String(64))
     url = Column(String(255))
     language = Column(String(32))
@@ -99,6 +108,7 @@ class Document(Base):
     references = relationship('Reference', cascade='all, delete', back_populates='document')
     duplicates = relationship('Document', backref=backref('original_document', remote_side=[id]))
     original_document_id = Column(Integer, ForeignKey('Document.id'))
+    duplicate_similarity = Column(Float)
 
     def __init__(self, external_key, kind, title, abstract, keywords, year, affiliations):
         Base.__init__(self)
@@ -211,7 +221,7 @@ class DocumentAuthor(Base):
     __tablename__ = 'Document_R_Author'
     document_id = Column(ForeignKey('Document.id'), primary_key=True)
     document = relationship('Document')
-    author_id = Column(ForeignKey('Author.id'), primary_key=True)
+    author_id = Column(ForeignKey('Author.id'), primary_key=True, index=True)
     author = relationship('Author')
     first = Column(Boolean, nullable=False)
     institution = relationship('Institution')
@@ -230,13 +240,75 @@ class DocumentTag(Base):
     __tablename__ = 'Document_R_Tag'
     document_id = Column(ForeignKey('Document.id'), primary_key=True)
     document = relationship('Document')
-    tag_id = Column(ForeignKey('Tag.id'), primary_key=True)
+    tag_id = Column(ForeignKey('Tag.id'), primary_key=True, index=True)
     tag = relationship('Tag')
 
     def __repr__(self):
         return f'DocumentTag(document={self.document!r}, tag={self.tag!r})'
 
 
+class ImportCheckpoint(Base):
+    """
+    Records how far a chunked import of a .bib file has gone.
+
+    The checkpoint is committed together with each chunk of documents, so an interrupted import can resume right
+    after the last chunk committed. It is identified by the absolute path of the file, and only holds while the
+    file keeps the same size and modification time; it is deleted when the import finishes.
+    """
+
+    __tablename__ = 'Import_Checkpoint'
+    id = Column(Integer, primary_key=True)
+    path = Column(String(1024), nullable=False, unique=True)
+    source = Column(String(32), nullable=False)
+    size = Column(Integer, nullable=False)
+    modified = Column(Integer, nullable=False)
+    entries = Column(Integer, nullable=False)
+    added = Column(Integer, nullable=False)
+    duplicates = Column(Integer, nullable=False)
+    import_date = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f'ImportCheckpoint(path={self.path!r}, entries={self.entries!r}, added={self.added!r})'
+
+
+class ImportSource(Base):
+    """
+    Describes a .bib file imported incrementally, as an item of the manifest of sources of the Catalog.
+
+    The size and digest of the file tell whether it changed since it was last imported; an unchanged file is not
+    even scanned again.
+    """
+
+    __tablename__ = 'Import_Source'
+    id = Column(Integer, primary_key=True)
+    path = Column(String(1024), nullable=False, unique=True)
+    source = Column(String(32), nullable=False)
+    size = Column(Integer, nullable=False)
+    digest = Column(String(64), nullable=False)
+    entries = Column(Integer, nullable=False)
+    import_date = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f'ImportSource(path={self.path!r}, size={self.size!r}, digest={self.digest!r})'
+
+
+class ImportedEntry(Base):
+    """
+    Records the digest of the raw contents of a BibTeX entry already imported incrementally from a given source.
+
+    An entry whose digest is recorded is skipped by the next incremental imports, whatever the file it comes from,
+    without being translated again.
+    """
+
+    __tablename__ = 'Imported_Entry'
+    digest = Column(String(64), primary_key=True)
+    source = Column(String(32), primary_key=True)
+    import_date = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f'ImportedEntry(digest={self.digest!r}, source={self.source!r})'
+
+
 class Institution(Base):
     """
     Describes an institution to which an Author may be affiliated.
@@ -244,7 +316,7 @@ class Institution(Base):
 
     __tablename__ = 'Institution'
     id = Column(Integer, primary_key=True)
-    name = Column(String(128), nullable=False)
+    name = Column(String(128), nullable=False, index=True)
     country = Column(String(30))
     import_date = Column(Date, nullable=False)
 
@@ -281,6 +353,40 @@ class Reference(Base):
         return f'Reference(id={self.id!r}, name={self.description!r})'
 
 
+class SchemaVersion(Base):
+    """
+    Records a migration applied to the schema of the Catalog.
+
+    The greatest version recorded is the version of the schema; the migrations newer than it are applied when the
+    Catalog is opened.
+    """
+
+    __tablename__ = 'Schema_Version'
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255), nullable=False)
+    migration_date = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f'SchemaVersion(version={self.version!r}, description={self.description!r})'
+
+
+class TitleBand(Base):
+    """
+    Indexes the title of an original Document by one of its MinHash band keys, for near-duplicate detection.
+
+    Each original Document has one row per band key computed by utility.TitleMinHash; Documents whose titles share
+    a band key are candidates to be near-duplicates of each other.
+    """
+
+    __tablename__ = 'Title_Band'
+    __table_args__ = {'sqlite_with_rowid': False}
+    key = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey('Document.id'), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f'TitleBand(key={self.key!r}, document_id={self.document_id!r})'
+
+
 class Tag(Base):
     """
     Describes a Tag that identifies some particular condition of a given Document.
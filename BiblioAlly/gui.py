@@ -485,7 +485,7 @@ class Browser:
                                    if self._document_is_in_filter(document, self._active_tags)]
 
     def _load_documents(self):
-        self._all_documents = self._catalog.documents_by()
+        self._all_documents = self._catalog.documents_by(load=cat.LOAD_BROWSE)
         self._all_documents.sort(key=lambda doc: (doc.year, doc.title))
 
     def _select_document_by_index(self, index):
@@ -550,18 +550,11 @@ class Browser:
         self._window[BUTTON_EDIT_DOC_METADATA].update(visible=element_visible)
 
     def _update_mini_dashboard(self):
-        doc_tags = dict()
-        for tag in self._catalog.system_tags:
-            doc_tags[tag] = 0
-        for doc in self._all_documents:
-            for tag in self._catalog.system_tags:
-                if tag in doc_tags:
-                    doc_tags[tag] += 1 if tag in [dt.tag for dt in doc.tags] else 0
         sort_order = [cat.TAG_PRE_SELECTED, cat.TAG_DUPLICATE, cat.TAG_SELECTED, cat.TAG_REJECTED, cat.TAG_IMPORTED]
         colors = [preselect_color[1], duplicate_color[1], select_color[1], reject_color[1], import_color[1]]
-        doc_tags = sorted(list(doc_tags.items()), key=lambda dt: sort_order.index(dt[0].name))
-        labels = [t[0].name for t in doc_tags]
-        sizes = [t[1] for t in doc_tags]
+        tag_counts = self._catalog.tag_counts(self._catalog.system_tag_names)
+        labels = [name for name in sort_order if name in tag_counts]
+        sizes = [tag_counts[name] for name in labels]
 
         total_count = sum(sizes)
         self._ax.clear()
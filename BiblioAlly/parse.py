@@ -9,9 +9,12 @@
 from arpeggio import *
 from arpeggio import RegExMatch as _
 
+from BiblioAlly import scanner
 
-def bibFile():  return ZeroOrMore(bibEntry), EOF
+
+def bibFile():  return ZeroOrMore([skippedEntry, bibEntry]), EOF
 def bibEntry(): return bibType, "{", bibKey, ",", bibFields, "}"
+def skippedEntry(): return _(r'@\s*(comment|preamble|string)\b', ignore_case=True), complexValue
 
 def bibType():   return _(r'@\w+')
 def bibKey():    return _(r'[^,]+')
@@ -23,7 +26,7 @@ def fieldNamePart(): return _(r'[-\w]+')
 def fieldValue(): return [complexValue, stringValue, simpleValue]
 
 def complexValue(): return "{", complexContent, "}"
-def simpleValue():  return _(r'[^,]*')
+def simpleValue():  return _(r'[^,}]*')
 def stringValue():  return '"', stringContent, '"'
 
 def complexContent(): return ZeroOrMore([complexPiece, textContent])
@@ -37,9 +40,18 @@ def textContent():    return _(r'((\\")|[^{}])+')
 
 
 class BibTeXVisitor(PTNodeVisitor):
+    def __init__(self, content=None, **kwargs):
+        # With the parsed content at hand, braced and quoted values are sliced from it as they are, since the
+        # whitespace skipped by the parser in front of a textContent match would be missing from the joined children
+        super().__init__(**kwargs)
+        self.content = content
+
     def visit_bibFile(self, node, children):
         return [x for x in children if type(x) is dict]
     
+    def visit_skippedEntry(self, node, children):
+        return None
+
     def visit_bibEntry(self, node, children):
         bibRef = {
             'type': children[0],
@@ -66,7 +78,7 @@ class BibTeXVisitor(PTNodeVisitor):
         return field
     
     def visit_fieldName(self, node, children):
-        name = ""
+        name = " "
         return name.join(children).strip()
     
     def visit_fieldValue(self, node, children):
@@ -74,6 +86,16 @@ class BibTeXVisitor(PTNodeVisitor):
             return ''
         return children[0]
     
+    def visit_complexValue(self, node, children):
+        if self.content is None:
+            return children[0] if len(children) > 0 else ''
+        return self.content[node[0].position_end:node[-1].position]
+
+    def visit_stringValue(self, node, children):
+        if self.content is None:
+            return children[0] if len(children) > 0 else ''
+        return self.content[node[0].position_end:node[-1].position]
+
     def visit_complexContent(self, node, children):
         complexContent = self.asString(children)
         return complexContent
@@ -97,3 +119,24 @@ class BibTeXVisitor(PTNodeVisitor):
             text = text + part
         return text
 
+
+# Declaring the Arpeggio parser backend, which turns a .bib file into the same proto-documents the streaming scanner
+# yields; the parser is built once, with packrat memoization turned on, and reused for every file
+
+_bibtex_parser = None
+
+
+def proto_documents_from_file(filename):
+    global _bibtex_parser
+    if _bibtex_parser is None:
+        _bibtex_parser = ParserPython(bibFile, memoization=True)
+    with open(filename, 'r', encoding='utf-8') as bib_file:
+        content = bib_file.read()
+    parse_tree = _bibtex_parser.parse(content)
+    proto_documents = []
+    for bibRef in visit_parse_tree(parse_tree, BibTeXVisitor(content)):
+        fields = {}
+        for name, value in bibRef['field'].items():
+            fields[name] = scanner.cleaned_value(value)
+        proto_documents.append({'type': bibRef['type'][1:].lower(), 'id': bibRef['id'], 'field': fields})
+    return proto_documents
@@ -0,0 +1,431 @@
+"""
+Declares a streaming BibTeX scanner that feeds the BiblioAlly translators.
+
+The scanner reads a .bib file in fixed-size chunks and yields one proto-document at a time, so the memory it needs
+is bounded by the size of the largest entry and not by the size of the file. Entry and field boundaries are found by
+tracking brace depth and quoting, which makes it independent of how the exporting tool breaks lines.
+
+A second input path memory-maps the file and scans it as bytes. Its proto-documents hold each entry as bytes and
+decode a field value only when a translator asks for it, so fields no dialect uses are never decoded at all.
+
+Entries can also be told apart by a digest of their raw bytes, which lets an incremental import find the entries of
+a file it has already seen without decoding or translating them.
+
+A proto-document is a dictionary with the following keys, the very same ones the translators have always consumed:
+    -type: the lower-cased entry type (article, inproceedings, ...);
+    -id: the citation key of the entry;
+    -field: a mapping of field names and their values, with curly braces removed and line breaks collapsed.
+"""
+import codecs
+import hashlib
+import mmap
+import os
+import re
+from collections.abc import Mapping
+from functools import partial
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_SIZE = 16
+
+
+class _Syntax:
+    def __init__(self, encode):
+        self.entry_start = re.compile(encode(r'@\s*([\w-]+)\s*{'))
+        self.braces = re.compile(encode(r'[{}]'))
+        self.value_delimiters = re.compile(encode(r'[{}",]'))
+        self.plain_value = re.compile(encode(r'\s*(?:{[^{}]*(?:{[^{}]*}[^{}]*)*}|[^{}",]*)\s*(?=[,}])'))
+        self.open, self.close, self.quote, self.comma, self.equals, self.backslash = \
+            [encode(token) for token in '{}",=\\']
+
+
+_text = _Syntax(str)
+_binary = _Syntax(str.encode)
+_line_breaks = re.compile(r'\s*\n\s*')
+_skipped_types = {'comment', 'preamble', 'string'}
+
+
+class MappedFields(Mapping):
+    """
+    The fields of an entry scanned as bytes, decoded and normalized only when asked for.
+
+    Behaves as a read-only dictionary of field names and values; each value is decoded once, on first access.
+    """
+
+    def __init__(self, entry: bytes, spans):
+        self._entry = entry
+        self._spans = spans
+        self._values = {}
+
+    def __getitem__(self, name):
+        value = self._values.get(name)
+        if value is None:
+            start, end = self._spans[name]
+            value = cleaned_value(self._entry[start:end].decode('utf-8'))
+            self._values[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._spans
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __repr__(self):
+        return f'MappedFields({list(self._spans)!r})'
+
+
+def proto_documents_from_file(filename: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Scans a .bib file, yielding one proto-document at a time.
+
+    Parameters:
+        filename: the file name of the .bib file to be scanned;
+        chunk_size: the amount of characters read from the file at once.
+
+    Example:
+        for proto_document in scanner.proto_documents_from_file('.\\Scopus\\refs.bib'):
+            print(proto_document['id'])
+    """
+
+    with open(filename, 'r', encoding='utf-8') as bib_file:
+        yield from proto_documents_from_stream(bib_file, chunk_size)
+
+
+def proto_documents_from_mapped_file(filename: str, start: int = 0, end: int = None):
+    """
+    Scans a memory-mapped .bib file as bytes, yielding one proto-document at a time.
+
+    Each proto-document keeps a copy of its own entry bytes, so it stays valid after the file is unmapped; its
+    'field' is a MappedFields instance that decodes only the values actually read.
+
+    Parameters:
+        filename: the file name of the .bib file to be scanned;
+        start, end: (optional) the byte range to be scanned, as returned by entry_ranges(); default is the whole file.
+    """
+
+    with open(filename, 'rb') as bib_file:
+        if os.fstat(bib_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(bib_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for entry_start, entry_end in _entry_spans(mapped, _binary, start, len(mapped) if end is None else end):
+                proto_document = _proto_document_from_mapped_entry(mapped[entry_start:entry_end])
+                if proto_document is not None:
+                    yield proto_document
+
+
+def proto_documents_from_mapped_spans(filename: str, spans):
+    """
+    Scans only the given entries of a memory-mapped .bib file, yielding one proto-document at a time.
+
+    Parameters:
+        filename: the file name of the .bib file to be scanned;
+        spans: the (start, end) byte offsets of the entries to be scanned, as returned by entry_digests().
+    """
+
+    if len(spans) == 0:
+        return
+    with open(filename, 'rb') as bib_file:
+        with mmap.mmap(bib_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for entry_start, entry_end in spans:
+                proto_document = _proto_document_from_mapped_entry(mapped[entry_start:entry_end])
+                if proto_document is not None:
+                    yield proto_document
+
+
+def entry_digests(filename: str):
+    """
+    Computes a digest of the raw bytes of each entry of a .bib file, without parsing its fields.
+
+    Entries are only delimited, by brace depth, and @comment, @preamble and @string entries are left out, so the cost
+    is about the one of reading the file. Two entries have the same digest only if they are byte by byte the same.
+
+    Parameters:
+        filename: the file name of the .bib file to be scanned.
+
+    Returns:
+        a list of (digest, start, end) tuples, in file order, where digest is a hexadecimal string and start and end
+        are the byte offsets of the entry, as accepted by proto_documents_from_mapped_spans().
+    """
+
+    digests = []
+    with open(filename, 'rb') as bib_file:
+        if os.fstat(bib_file.fileno()).st_size == 0:
+            return digests
+        with mmap.mmap(bib_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for entry_start, entry_end in _entry_spans(mapped, _binary, 0, len(mapped)):
+                header = _binary.entry_start.match(mapped, entry_start, entry_end)
+                if header.group(1).decode('ascii').lower() in _skipped_types:
+                    continue
+                digest = hashlib.blake2b(mapped[entry_start:entry_end], digest_size=DIGEST_SIZE).hexdigest()
+                digests.append((digest, entry_start, entry_end))
+    return digests
+
+
+def file_digest(filename: str) -> str:
+    """
+    Computes a digest of the whole contents of a file, as a hexadecimal string.
+    """
+
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(filename, 'rb') as bib_file:
+        for chunk in iter(partial(bib_file.read, 16 * CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def proto_documents_from_stream(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Scans a text stream, yielding one proto-document at a time.
+
+    Parameters:
+        stream: any object with a read(size) method returning str, like an open file or an io.StringIO;
+        chunk_size: the amount of characters read from the stream at once.
+    """
+
+    yield from _proto_documents_from_entries(entries_from_stream(stream, chunk_size))
+
+
+def proto_documents_from_range(filename: str, start: int, end: int, chunk_size: int = CHUNK_SIZE):
+    """
+    Scans a byte range of a .bib file, yielding one proto-document at a time.
+
+    Parameters:
+        filename: the file name of the .bib file to be scanned;
+        start, end: the byte offsets where the range starts and ends, as returned by entry_ranges();
+        chunk_size: the amount of bytes read from the file at once.
+    """
+
+    with open(filename, 'rb') as bib_file:
+        bib_file.seek(start)
+        yield from _proto_documents_from_entries(entries_from_chunks(_decoded_chunks(bib_file, end - start,
+                                                                                     chunk_size)))
+
+
+def entry_ranges(filename: str, parts: int):
+    """
+    Splits a .bib file into byte ranges of about the same size, each one starting at the beginning of an entry.
+
+    The file is memory-mapped: for each split point, the scanner skips whole entries, by brace depth, from the previous
+    split point to the ideal offset and moves on to the next entry starting a line, so a line starting with '@type{'
+    inside a value is never taken for an entry. Ranges that would be empty are dropped, so fewer ranges than parts may
+    be returned for small files.
+
+    Parameters:
+        filename: the file name of the .bib file to be split;
+        parts: the desired number of ranges.
+
+    Returns:
+        a list of (start, end) byte offsets, in file order, covering the whole file.
+    """
+
+    size = os.path.getsize(filename)
+    offsets = [0]
+    if size > 0:
+        with open(filename, 'rb') as bib_file:
+            with mmap.mmap(bib_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for part in range(1, parts):
+                    offset = _next_entry_offset(mapped, offsets[-1], max(size * part // parts, offsets[-1] + 1))
+                    if offset is None:
+                        break
+                    offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def entries_from_stream(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Splits a text stream into the raw text of its entries, from the '@' to the matching closing brace.
+
+    Text between entries is ignored, as BibTeX itself does. An entry left open at the end of the stream is yielded
+    as it is, so a truncated file still delivers its last fields.
+    """
+
+    return entries_from_chunks(iter(partial(stream.read, chunk_size), ''))
+
+
+def entries_from_chunks(chunks):
+    """
+    Splits an iterable of text chunks into the raw text of its entries, just like entries_from_stream().
+    """
+
+    buffer = ''
+    scan = 0
+    start = None
+    depth = 0
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if start is None:
+                match = _text.entry_start.search(buffer, scan)
+                if match is None:
+                    at = buffer.rfind('@', scan)
+                    buffer = buffer[at:] if at >= 0 else ''
+                    scan = 0
+                    break
+                start, scan, depth = match.start(), match.end(), 1
+            end = None
+            for match in _text.braces.finditer(buffer, scan):
+                depth += 1 if match.group() == '{' else -1
+                if depth == 0:
+                    end = match.end()
+                    break
+            if end is None:
+                buffer = buffer[start:]
+                start, scan = 0, len(buffer)
+                break
+            yield buffer[start:end]
+            start, scan = None, end
+    if start is not None:
+        yield buffer[start:]
+
+
+def proto_document_from_entry(entry: str):
+    """
+    Translates the raw text of one entry into a proto-document.
+
+    Returns:
+        the proto-document, or None if the entry is a @comment, @preamble or @string.
+    """
+
+    parsed_entry = _parsed_entry(entry, _text)
+    if parsed_entry is None:
+        return None
+    kind, key, field_spans = parsed_entry
+    kind = kind.lower()
+    if kind in _skipped_types:
+        return None
+    fields = {}
+    for name, value_start, value_end in field_spans:
+        fields[name] = cleaned_value(entry[value_start:value_end])
+    return {'type': kind, 'id': key.strip(), 'field': fields}
+
+
+def cleaned_value(value: str) -> str:
+    """
+    Normalizes the raw text of a field value the way the translators expect it.
+
+    Line breaks and their surrounding blanks are collapsed into one space, enclosing quotes are dropped and every
+    curly brace is removed.
+    """
+
+    if '\n' in value:
+        value = _line_breaks.sub(' ', value)
+    value = value.strip()
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+    if '{' in value or '}' in value:
+        value = value.replace('{', '').replace('}', '').strip()
+    return value
+
+
+def _decoded_chunks(bib_file, size, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while size > 0:
+        data = bib_file.read(min(chunk_size, size))
+        if len(data) == 0:
+            break
+        size -= len(data)
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def _next_entry_offset(buffer, start, offset):
+    # start is a split point, so it is at brace depth 0 and the entries after it can be skipped whole.
+    for entry_start, _ in _entry_spans(buffer, _binary, start, len(buffer)):
+        if entry_start >= offset and buffer[entry_start - 1:entry_start] == b'\n':
+            return entry_start
+    return None
+
+
+def _entry_spans(buffer, syntax, position, end):
+    while True:
+        match = syntax.entry_start.search(buffer, position, end)
+        if match is None:
+            return
+        depth = 1
+        for brace in syntax.braces.finditer(buffer, match.end(), end):
+            depth += 1 if brace.group() == syntax.open else -1
+            if depth == 0:
+                break
+        if depth > 0:
+            yield match.start(), end
+            return
+        yield match.start(), brace.end()
+        position = brace.end()
+
+
+def _parsed_entry(entry, syntax):
+    header = syntax.entry_start.match(entry)
+    if header is None:
+        return None
+    field_spans = []
+    position = header.end()
+    comma = entry.find(syntax.comma, position)
+    if comma < 0:
+        key = entry[position:].rstrip(syntax.close)
+        position = len(entry)
+    else:
+        key = entry[position:comma]
+        position = comma + 1
+    while position < len(entry):
+        equals = entry.find(syntax.equals, position)
+        if equals < 0:
+            break
+        name = entry[position:equals].strip()
+        end, closes_entry = _value_end(entry, equals + 1, syntax)
+        if len(name) > 0:
+            field_spans.append((name, equals + 1, end))
+        if closes_entry:
+            break
+        position = end + 1
+    return header.group(1), key, field_spans
+
+
+def _proto_document_from_mapped_entry(entry):
+    parsed_entry = _parsed_entry(entry, _binary)
+    if parsed_entry is None:
+        return None
+    kind, key, field_spans = parsed_entry
+    kind = kind.decode('ascii').lower()
+    if kind in _skipped_types:
+        return None
+    spans = {}
+    for name, value_start, value_end in field_spans:
+        spans[name.decode('utf-8')] = (value_start, value_end)
+    return {'type': kind, 'id': key.decode('utf-8').strip(), 'field': MappedFields(entry, spans)}
+
+
+def _proto_documents_from_entries(entries):
+    for entry in entries:
+        proto_document = proto_document_from_entry(entry)
+        if proto_document is not None:
+            yield proto_document
+
+
+def _value_end(entry, position, syntax):
+    plain = syntax.plain_value.match(entry, position)
+    if plain is not None:
+        end = plain.end()
+        return end, entry[end:end + 1] == syntax.close
+    depth = 0
+    quoted = False
+    while True:
+        match = (syntax.braces if depth > 0 else syntax.value_delimiters).search(entry, position)
+        if match is None:
+            return len(entry), True
+        delimiter = match.group()
+        position = match.end()
+        if delimiter == syntax.open:
+            depth += 1
+        elif delimiter == syntax.close:
+            if depth == 0:
+                return match.start(), True
+            depth -= 1
+        elif delimiter == syntax.quote:
+            if entry[match.start() - 1:match.start()] != syntax.backslash:
+                quoted = not quoted
+        elif not quoted:
+            return match.start(), False
@@ -1,7 +1,26 @@
-from . import basetranslator as bt, domain
+from . import basetranslator as bt, domain, parse, scanner
 import re
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice, repeat
 from typing import Dict
-from .utility import alphanum_crc32
+from .utility import KeywordMatcher, alphanum_crc32, normalized_doi, title_fingerprint
+
+PARSER_ARPEGGIO = 'arpeggio'
+PARSER_LINE = 'line'
+PARSER_MMAP = 'mmap'
+PARSER_SCANNER = 'scanner'
+
+PARSE_CACHE_SIZE = 8192
+NAME_CACHE_SIZE = 65536
+
+record_fields = [
+    'external_key', 'kind', 'title', 'title_crc32', 'title_fingerprint', 'abstract', 'year', 'journal', 'publisher',
+    'address', 'pages', 'volume', 'number', 'doi', 'doi_normalized', 'international_number', 'url', 'language',
+    'document_type', 'generator',
+]
 
 key_names = [
     'Accuvision',
@@ -334,6 +353,55 @@ special_names: Dict[str, str] = {
     'NUS': 'Singapore',
     'POSTECH': 'South Korea',
 }
+_key_name_matcher = KeywordMatcher(key_names)
+
+
+class CacheStatistics(namedtuple('CacheStatistics', ['hits', 'misses'])):
+    """
+    The hits and misses of one of the parse caches, the memos of parsed author fields and affiliations.
+    """
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class KeywordNormalizer:
+    """
+    Turns keyword fields into domain.Keyword instances, handing out one canonical instance per keyword name.
+
+    Names are stripped and capitalized, and the same name always gets the same Keyword instance, so every document
+    translated through one normalizer shares its keywords and no keyword is ever created twice.
+    """
+
+    def __init__(self):
+        self.keywords = dict()
+
+    def keyword(self, name: str) -> domain.Keyword:
+        """
+        Returns the canonical Keyword instance of an already normalized name, creating it on first use.
+        """
+
+        keyword = self.keywords.get(name)
+        if keyword is None:
+            keyword = domain.Keyword(name=sys.intern(name))
+            self.keywords[name] = keyword
+        return keyword
+
+    def keywords_from_field(self, keywords_field: str, separators: str = ';'):
+        """
+        Splits a keyword field into its canonical Keyword instances, without repetitions and in the field order.
+
+        Parameters:
+            keywords_field: the value of the keyword field, without curly braces;
+            separators: every character that separates two keywords in the field.
+        """
+
+        for separator in separators[1:]:
+            keywords_field = keywords_field.replace(separator, separators[0])
+        names = dict.fromkeys(name.strip().capitalize() for name in keywords_field.split(separators[0]))
+        return [self.keyword(name) for name in names]
 
 
 class Translator(bt.BaseTranslator):
@@ -341,16 +409,75 @@ class Translator(bt.BaseTranslator):
         'conference': 'proceedings',
         'inproceedings': 'proceedings',
     }
+    parsers = dict()
+    cache_statistics = None
 
-    def documents_from_file(self, filename):
-        with open(filename, "r", encoding="utf-8") as texFile:
-            if texFile.mode != "r":
-                return {}
-            content = texFile.read()
-        proto_documents = self._proto_documents_from_content(content)
+    def __init__(self):
+        self.keyword_normalizer = KeywordNormalizer()
+
+    def documents_from_file(self, filename, parser=None, workers=None):
+        if parser is None:
+            parser = PARSER_MMAP
+        if workers is not None and workers > 1 and parser in [PARSER_MMAP, PARSER_SCANNER]:
+            return self._documents_from_file_in_parallel(filename, parser, workers)
+        return self.documents_from_proto_documents(Translator.parsers[parser](filename))
+
+    def documents_from_proto_documents(self, proto_documents):
+        """
+        Translates proto-documents already scanned by a parser backend into documents, recording the parse cache
+        statistics.
+        """
+
+        statistics = parse_cache_statistics()
         documents = self._documents_from_proto_documents(proto_documents)
+        self.cache_statistics = parse_cache_statistics(since=statistics)
         return documents
 
+    def iter_documents_from_file(self, filename, parser=None, start=0):
+        """
+        Translates a .bib file one document at a time, as they are parsed, instead of building a list of them all.
+
+        Parameters:
+            filename: the file name of the .bib file to be translated;
+            parser: (optional) the identifier of the parser backend; default is the memory-mapped scanner;
+            start: (optional) the amount of entries at the beginning of the file skipped without being translated.
+
+        The parse cache statistics are recorded when the last document has been delivered.
+        """
+
+        if parser is None:
+            parser = PARSER_MMAP
+        statistics = parse_cache_statistics()
+        yield from self._iter_documents_from_proto_documents(islice(Translator.parsers[parser](filename), start, None))
+        self.cache_statistics = parse_cache_statistics(since=statistics)
+
+    @staticmethod
+    def record_from_document(document):
+        record = {name: getattr(document, name) for name in record_fields}
+        record['authors'] = [(doc_author.author.short_name, doc_author.author.long_name, doc_author.first,
+                              None if doc_author.institution is None
+                              else (doc_author.institution.name, doc_author.institution.country))
+                             for doc_author in document.authors]
+        record['keywords'] = [keyword.name for keyword in document.keywords]
+        return record
+
+    @staticmethod
+    def document_from_record(record, keyword_normalizer=None):
+        affiliations = []
+        for short_name, long_name, first, institution in record['authors']:
+            affiliation = domain.DocumentAuthor(author=domain.Author(short_name, long_name), first=first)
+            if institution is not None:
+                affiliation.institution = domain.Institution(name=institution[0], country=institution[1])
+            affiliations.append(affiliation)
+        if keyword_normalizer is None:
+            keyword_normalizer = KeywordNormalizer()
+        keywords = [keyword_normalizer.keyword(name) for name in record['keywords']]
+        document = domain.Document(record['external_key'], record['kind'], record['title'], record['abstract'],
+                                   keywords, record['year'], affiliations)
+        for name in record_fields:
+            setattr(document, name, record[name])
+        return document
+
     def bibtext_from_documents(self, documents):
         proto_documents = self._proto_documents_from_documents(documents)
         bibtexts = [self._as_bibtex(pd) for pd in proto_documents]
@@ -367,13 +494,25 @@ class Translator(bt.BaseTranslator):
         bibtex = f'@{kind}' + '{' + f'{external_key}\n' + ',\n'.join(key_value) + '\n}\n'
         return bibtex
 
+    def _documents_from_file_in_parallel(self, filename, parser, workers):
+        ranges = scanner.entry_ranges(filename, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_records_from_range, repeat(type(self)), repeat(filename),
+                                        [start for start, _ in ranges], [end for _, end in ranges], repeat(parser)))
+        self.cache_statistics = merged_cache_statistics([statistics for _, statistics in results])
+        return [self.document_from_record(record, self.keyword_normalizer) for records, _ in results
+                for record in records]
+
     def _documents_from_proto_documents(self, proto_documents):
-        documents = []
+        return list(self._iter_documents_from_proto_documents(proto_documents))
+
+    def _iter_documents_from_proto_documents(self, proto_documents):
         for proto_document in proto_documents:
             document = self._document_from_proto_document(proto_document)
             document.title_crc32 = alphanum_crc32(document.title)
-            documents.append(document)
-        return documents
+            document.title_fingerprint = title_fingerprint(document.title)
+            document.doi_normalized = normalized_doi(document.doi)
+            yield document
 
     def _proto_documents_from_documents(self, documents):
         proto_documents = []
@@ -422,6 +561,12 @@ class Translator(bt.BaseTranslator):
             new_affiliations.append(new_affiliation)
         return new_affiliations
 
+    @staticmethod
+    def _proto_documents_from_file(filename):
+        with open(filename, "r", encoding="utf-8") as texFile:
+            content = texFile.read()
+        return Translator._proto_documents_from_content(content)
+
     @staticmethod
     def _proto_documents_from_content(content):
         proto_documents = []
@@ -476,80 +621,89 @@ class Translator(bt.BaseTranslator):
 
     def _affiliations_from_field(self, affiliations_field, separator='; '):
         affiliations = []
-        affiliation_pieces = affiliations_field.replace('&amp;', '&').split(separator)
-        for affiliation_piece in affiliation_pieces:
-            if affiliation_piece[-1] == '.':
-                parts = re.sub('[()]', '', affiliation_piece[0:-1]).split(', ')
-            else:
-                parts = re.sub('[()]', '', affiliation_piece).split(', ')
-            count = len(parts)
-
-            while count > 0:
-                words = parts[count - 1].split(' ')
-                word_count = len(words)
-                for word_index, word in enumerate(words):
-                    if not self._is_name(word):
-                        words[word_index] = ''
-                parts[count - 1] = ' '.join(words).strip()
-                if len(parts[count - 1].strip()) == 0:
-                    count -= 1
-                if self._is_name(parts[count - 1]):
-                    break
-                count -= 1
-            if count == 0:
-                parts = re.sub('[()]', '', affiliation_piece).split(', ')
-                count = len(parts)
-
-            institution_name = ', '.join(parts[0:count - 1])
-            institution_country = parts[count - 1]
-            parts = institution_country.split(' ')
-            if len(parts) > 1:
-                last_part = parts[len(parts) - 1]
-                if last_part == 'USA':
-                    institution_country = last_part
-                    institution_name = institution_name + ', ' + ' '.join(parts[0:len(parts) - 2])
-            part_index = institution_country.find('e-mail:')
-            if part_index > -1:
-                institution_country = institution_country[0:part_index - 1].strip()
-            for key_name in key_names:
-                if institution_country.find(key_name) > -1:
-                    institution_country = key_name
-                    break
-            if institution_country in special_names:
-                if institution_name == '':
-                    institution_name = institution_country
-                else:
-                    institution_name = institution_name + ', ' + institution_country
-                institution_country = special_names[institution_country]
+        for affiliation_piece in affiliations_field.replace('&amp;', '&').split(separator):
+            institution_name, institution_country = Translator._parsed_affiliation(affiliation_piece)
             institution = domain.Institution(name=institution_name, country=institution_country)
             affiliations.append(domain.DocumentAuthor(institution=institution, first=len(affiliations) == 0))
         return affiliations
 
+    @staticmethod
+    @lru_cache(maxsize=PARSE_CACHE_SIZE)
+    def _parsed_affiliation(affiliation_piece):
+        if affiliation_piece[-1] == '.':
+            parts = re.sub('[()]', '', affiliation_piece[0:-1]).split(', ')
+        else:
+            parts = re.sub('[()]', '', affiliation_piece).split(', ')
+        count = len(parts)
+
+        while count > 0:
+            words = parts[count - 1].split(' ')
+            word_count = len(words)
+            for word_index, word in enumerate(words):
+                if not Translator._is_name(word):
+                    words[word_index] = ''
+            parts[count - 1] = ' '.join(words).strip()
+            if len(parts[count - 1].strip()) == 0:
+                count -= 1
+            if Translator._is_name(parts[count - 1]):
+                break
+            count -= 1
+        if count == 0:
+            parts = re.sub('[()]', '', affiliation_piece).split(', ')
+            count = len(parts)
+
+        institution_name = ', '.join(parts[0:count - 1])
+        institution_country = parts[count - 1]
+        parts = institution_country.split(' ')
+        if len(parts) > 1:
+            last_part = parts[len(parts) - 1]
+            if last_part == 'USA':
+                institution_country = last_part
+                institution_name = institution_name + ', ' + ' '.join(parts[0:len(parts) - 2])
+        part_index = institution_country.find('e-mail:')
+        if part_index > -1:
+            institution_country = institution_country[0:part_index - 1].strip()
+        key_name = _key_name_matcher.first(institution_country)
+        if key_name is not None:
+            institution_country = key_name
+        if institution_country in special_names:
+            if institution_name == '':
+                institution_name = institution_country
+            else:
+                institution_name = institution_name + ', ' + institution_country
+            institution_country = special_names[institution_country]
+        return institution_name, institution_country
+
+    def _keywords_from_field(self, keywords_field, separators=';'):
+        return self.keyword_normalizer.keywords_from_field(keywords_field, separators)
+
     @staticmethod
     def _authors_from_field(author_field, use_long_as_short=False):
+        return [domain.Author(short_name, long_name)
+                for short_name, long_name in Translator._parsed_authors(author_field, use_long_as_short)]
+
+    @staticmethod
+    @lru_cache(maxsize=PARSE_CACHE_SIZE)
+    def _parsed_authors(author_field, use_long_as_short):
         author_field = author_field.replace("\\", "").replace("'", "").replace('"', "").replace('{', ""). \
             replace('}', "")
-        author_names = author_field.split(' and ')
-        if len(author_names) == 0:
-            author_names = ['Author, Unamed']
-        for i in range(len(author_names)):
-            if Translator._is_direct_name(author_names[i]):
-                author_names[i] = Translator._reversed_name(author_names[i])
-
         authors = []
-        inserted_names = []
-        for authorName in author_names:
-            if use_long_as_short:
-                short_name = authorName.strip()
-            else:
-                short_name = domain.Author.short_name_from_name(authorName.strip())
+        inserted_names = set()
+        for author_name in author_field.split(' and '):
+            if Translator._is_direct_name(author_name):
+                author_name = Translator._reversed_name(author_name)
+            long_name = author_name.strip()
+            short_name = long_name if use_long_as_short else Translator._short_name(long_name)
             if short_name in inserted_names:
                 continue
-            inserted_names.append(short_name)
-            long_name = authorName.strip()
-            author = domain.Author(short_name, long_name)
-            authors.append(author)
-        return authors
+            inserted_names.add(short_name)
+            authors.append((short_name, long_name))
+        return tuple(authors)
+
+    @staticmethod
+    @lru_cache(maxsize=NAME_CACHE_SIZE)
+    def _short_name(long_name):
+        return sys.intern(domain.Author.short_name_from_name(long_name))
 
     @staticmethod
     def _curly(value: str, separator: str = ",", rep: int = 1) -> str:
@@ -561,10 +715,8 @@ class Translator(bt.BaseTranslator):
 
     @staticmethod
     def _is_name(value):
-        for c in value:
-            if not (c.isalpha() or c == ' ' or c == "'" or c == '-'):
-                return False
-        return True
+        letters = value.replace(' ', '').replace("'", '').replace('-', '')
+        return len(letters) == 0 or letters.isalpha()
 
     @staticmethod
     def _is_direct_name(name):
@@ -591,3 +743,55 @@ class Translator(bt.BaseTranslator):
         else:
             end = len(value)
         return value[start:end]
+
+
+def parse_cache_statistics(since=None):
+    """
+    Returns the hits and misses of the parse caches of the current process.
+
+    Parameters:
+        since: (optional) the statistics taken at an earlier moment, to report only what happened after it.
+
+    Returns:
+        a dictionary with one CacheStatistics for each cache: 'affiliations' and 'authors'.
+    """
+
+    statistics = dict()
+    for name, cache in [('affiliations', Translator._parsed_affiliation), ('authors', Translator._parsed_authors)]:
+        info = cache.cache_info()
+        hits, misses = info.hits, info.misses
+        if since is not None:
+            hits, misses = hits - since[name].hits, misses - since[name].misses
+        statistics[name] = CacheStatistics(hits, misses)
+    return statistics
+
+
+def merged_cache_statistics(all_statistics):
+    """
+    Adds up the parse cache statistics collected by separate translations, like the ones made by worker processes.
+    """
+
+    merged = dict()
+    for statistics in all_statistics:
+        for name, cache_statistics in statistics.items():
+            hits, misses = merged.get(name, (0, 0))
+            merged[name] = CacheStatistics(hits + cache_statistics.hits, misses + cache_statistics.misses)
+    return merged
+
+
+def _records_from_range(translator_class, filename, start, end, parser):
+    translator = translator_class()
+    if parser == PARSER_MMAP:
+        proto_documents = scanner.proto_documents_from_mapped_file(filename, start, end)
+    else:
+        proto_documents = scanner.proto_documents_from_range(filename, start, end)
+    statistics = parse_cache_statistics()
+    documents = translator._documents_from_proto_documents(proto_documents)
+    return [translator.record_from_document(document) for document in documents], \
+        parse_cache_statistics(since=statistics)
+
+
+Translator.parsers[PARSER_ARPEGGIO] = parse.proto_documents_from_file
+Translator.parsers[PARSER_LINE] = Translator._proto_documents_from_file
+Translator.parsers[PARSER_MMAP] = scanner.proto_documents_from_mapped_file
+Translator.parsers[PARSER_SCANNER] = scanner.proto_documents_from_file
@@ -1,7 +1,13 @@
 import binascii
+import hashlib
 import re
+import struct
+import unicodedata
+from urllib.parse import unquote
 
 pattern = re.compile('[\W_]+', re.UNICODE)
+doi_prefix = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+latex_command = re.compile(r'\\[a-zA-Z]+\s*|\\[^a-zA-Z\s]|[{}]')
 
 
 def alphanum(text: str) -> str:
@@ -12,3 +18,202 @@ def alphanum(text: str) -> str:
 def alphanum_crc32(text: str) -> int:
     text = alphanum(text).lower().encode("utf-8")
     return binascii.crc32(text)
+
+
+def title_fingerprint(text: str) -> int:
+    """
+    Fingerprints a title for exact duplicate detection, ignoring case, blanks and punctuation.
+
+    The fingerprint is a 64-bit blake2b digest of the same normalized text alphanum_crc32() checksums, returned as a
+    signed integer so it fits a SQLite INTEGER column. With 64 bits, collisions only become likely past billions of
+    titles, while 32-bit checksums already collide at tens of thousands.
+    """
+
+    text = alphanum(text).lower().encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'little', signed=True)
+
+
+def normalized_doi(doi):
+    """
+    Normalizes a DOI so the same DOI written by different sources compares equal.
+
+    Blanks, 'https://doi.org/', 'http://dx.doi.org/' and 'doi:' prefixes are stripped, URL escapes are decoded and
+    the result is lower-cased, as DOIs are case-insensitive.
+
+    Returns:
+        the normalized DOI, or None when there is no DOI or the text does not look like one (it must start with
+        '10.').
+    """
+
+    if doi is None:
+        return None
+    doi = doi_prefix.sub('', doi.strip()).strip()
+    if '%' in doi:
+        doi = unquote(doi)
+    doi = doi.lower()
+    return doi if doi.startswith('10.') else None
+
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed list of keywords occur inside a text, in a single pass over the text.
+
+    The keywords are compiled once into an Aho-Corasick automaton, so the cost of a search grows with the length of
+    the text and not with the number of keywords.
+
+    Parameters:
+        keywords: the keywords to look for; their order is the priority used by first().
+
+    Example:
+        matcher = KeywordMatcher(['China', 'Hong Kong'])
+        matcher.first('Kowloon, Hong Kong, China')  # 'China'
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for c in keyword:
+                next_state = self._goto[state].get(c)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][c] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                state = next_state
+            if self._best[state] is None or index < self._best[state]:
+                self._best[state] = index
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for c, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail > 0 and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(c, 0)
+                self._fail[next_state] = fail
+                inherited = self._best[fail]
+                if inherited is not None and (self._best[next_state] is None or inherited < self._best[next_state]):
+                    self._best[next_state] = inherited
+                queue.append(next_state)
+
+    def first(self, text: str):
+        """
+        Returns the keyword that comes first in the keyword list among those occurring in the text, or None.
+        """
+
+        goto, fail, best = self._goto, self._fail, self._best
+        found = None
+        state = 0
+        for c in text:
+            while state > 0 and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            index = best[state]
+            if index is not None and (found is None or index < found):
+                found = index
+                if found == 0:
+                    break
+        return None if found is None else self.keywords[found]
+
+
+class TitleMinHash:
+    """
+    Sketches titles for near-duplicate detection, with MinHash signatures split into bands for locality-sensitive
+    hashing.
+
+    A title is normalized (LaTeX commands and accents removed, lower case, punctuation collapsed into spaces) and cut
+    into overlapping character shingles. The signature is a one-permutation MinHash: every shingle is hashed once and
+    the minimum hash is kept in each of bands * rows bins, the empty bins being filled in from their neighbours. Two
+    titles share a band key with a probability that grows steeply with their Jaccard similarity, so looking up the
+    band keys of a title finds its near-duplicates without comparing it to every other title.
+
+    Parameters:
+        bands: the amount of band keys per title;
+        rows: the amount of signature values hashed into each band key;
+        shingle_size: the amount of characters of each shingle.
+
+    Example:
+        min_hash = TitleMinHash()
+        shingles = min_hash.shingles('Deep learning for sentiment analysis: a survey')
+        keys = min_hash.band_keys(shingles)
+        TitleMinHash.similarity(shingles, min_hash.shingles('Deep Learning for Sentiment Analysis'))  # 0.79
+    """
+
+    def __init__(self, bands=8, rows=4, shingle_size=4):
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self._bins = bands * rows
+        self._offset = -(-(1 << 32) // self._bins)
+        self._band_format = f'<{rows + 1}I'
+
+    def shingles(self, title: str) -> frozenset:
+        """
+        Returns the set of character shingles of the normalized title, as bytes; an empty set for an empty title.
+        """
+
+        text = unicodedata.normalize('NFKD', latex_command.sub('', title))
+        if not text.isascii():
+            text = ''.join(c for c in text if not unicodedata.combining(c))
+        text = pattern.sub(' ', text.lower()).strip().encode('utf-8')
+        size = self.shingle_size
+        if len(text) <= size:
+            return frozenset([text]) if len(text) > 0 else frozenset()
+        return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+    def signature(self, shingles) -> list:
+        """
+        Returns the MinHash signature of a set of shingles, a list of bands * rows integers.
+        """
+
+        bins = self._bins
+        empty = 1 << 32
+        minimums = [empty] * bins
+        crc32 = binascii.crc32
+        for shingle in shingles:
+            value = crc32(shingle)
+            index = value % bins
+            value //= bins
+            if value < minimums[index]:
+                minimums[index] = value
+        if empty in minimums and len(shingles) > 0:
+            filled = list(minimums)
+            for index in range(bins):
+                if minimums[index] == empty:
+                    distance = 1
+                    while minimums[(index + distance) % bins] == empty:
+                        distance += 1
+                    filled[index] = minimums[(index + distance) % bins] + distance * self._offset
+            minimums = filled
+        return minimums
+
+    def band_keys(self, shingles) -> list:
+        """
+        Returns the band keys of a set of shingles, as signed 64-bit integers that can be stored in SQLite.
+        """
+
+        if len(shingles) == 0:
+            return []
+        signature = self.signature(shingles)
+        rows = self.rows
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(struct.pack(self._band_format, band, *signature[band * rows:(band + 1) * rows]),
+                                     digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(shingles, other_shingles) -> float:
+        """
+        Returns the Jaccard similarity of two sets of shingles, from 0.0 to 1.0.
+        """
+
+        if len(shingles) == 0 or len(other_shingles) == 0:
+            return 0.0
+        common = len(shingles & other_shingles)
+        return common / (len(shingles) + len(other_shingles) - common)
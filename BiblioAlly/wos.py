@@ -39,15 +39,7 @@ class WoSBibTexTranslator(bibtex.Translator):
         affiliations = self._expand_affiliations(affiliations, authors)
         keywords = []
         if 'Keywords' in fields:
-            all_keywords = self._all_uncurly(fields['Keywords']).split(';')
-            keyword_names = set()
-            for keyword_name in all_keywords:
-                name = keyword_name.strip().capitalize()
-                if name not in keyword_names:
-                    keyword_names.add(name)
-            keyword_names = list(keyword_names)
-            for keyword_name in keyword_names:
-                keywords.append(domain.Keyword(name=keyword_name))
+            keywords = self._keywords_from_field(self._all_uncurly(fields['Keywords']))
         document = domain.Document(proto_document['id'].strip(), kind, title, abstract, keywords, year, affiliations)
         document.generator = "Web of Science"
         if 'DOI' in fields:
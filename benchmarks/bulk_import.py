@@ -0,0 +1,62 @@
+"""
+Compares the ORM and the bulk persistence paths of Catalog.import_from_file() on the same documents.
+
+The corpus is built by corpus.write_scopus_copies(): tests/refs/scopus.bib repeated with a distinct prefix in every
+title and DOI, so every copy is added instead of being skipped as a duplicate. The documents are translated once per
+mode, outside the timing, so only duplicate detection, entity resolution and persistence are measured; both catalogs
+are then checked for the same contents.
+
+Usage:
+    python benchmarks/bulk_import.py [--copies N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from BiblioAlly import catalog as cat, scopus
+from corpus import write_scopus_copies
+
+
+def _rows(filename):
+    connection = sqlite3.connect(filename)
+    try:
+        return sorted(line for line in connection.iterdump() if line.startswith('INSERT'))
+    finally:
+        connection.close()
+
+
+def benchmark(corpus, folder, bulk):
+    documents = scopus.ScopusTranslator().documents_from_file(corpus)
+    filename = os.path.join(folder, 'bulk.db' if bulk else 'orm.db')
+    catalog = cat.Catalog(filename, echo=False)
+    start = time.perf_counter()
+    added_count, _ = catalog._import_documents(documents, bulk)
+    catalog.commit()
+    elapsed = time.perf_counter() - start
+    catalog.close()
+    return added_count, elapsed, filename
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arguments.add_argument('--copies', type=int, default=40)
+    options = arguments.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = os.path.join(folder, 'corpus.bib')
+        write_scopus_copies(corpus, options.copies)
+        results = [benchmark(corpus, folder, bulk) for bulk in [False, True]]
+        print(f'{"mode":<6} {"documents":>10} {"seconds":>9} {"documents/s":>12}')
+        for mode, (added_count, elapsed, _) in zip(['orm', 'bulk'], results):
+            print(f'{mode:<6} {added_count:>10} {elapsed:>9.2f} {added_count / elapsed:>12,.0f}')
+        print(f'Speed-up: {results[0][1] / results[1][1]:.1f}x; same contents: '
+              f'{_rows(results[0][2]) == _rows(results[1][2])}')
+
+
+if __name__ == '__main__':
+    main()
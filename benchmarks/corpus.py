@@ -0,0 +1,24 @@
+"""
+Builds the .bib corpora shared by the benchmarks from the reference files under tests/refs.
+"""
+import os
+import re
+
+REFS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'refs')
+
+
+def write_scopus_copies(filename, copies):
+    """
+    Writes tests/refs/scopus.bib to filename the given number of times, each copy with a prefix of its own in every
+    title and DOI, so an import adds every copy just as it adds the first one, instead of skipping it as a duplicate
+    of the first. The entries with no DOI are added as near-duplicates of the first copy.
+    """
+
+    with open(os.path.join(REFS_PATH, 'scopus.bib'), 'r', encoding='utf-8') as bib_file:
+        content = bib_file.read()
+    with open(filename, 'w', encoding='utf-8') as corpus:
+        for copy in range(copies):
+            copy_content = re.sub(r'(\n\s*title\s*=\s*{)', lambda match: match.group(1) + f'Copy {copy} ', content)
+            corpus.write(re.sub(r'(\n\s*doi\s*=\s*{10\.[^/]*/)', lambda match: match.group(1) + f'copy{copy}.',
+                                copy_content))
+            corpus.write('\n')
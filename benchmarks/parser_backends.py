@@ -0,0 +1,107 @@
+"""
+Compares the registered BibTeX parser backends head-to-head on the same corpus.
+
+Each backend runs in a fresh process, so the peak resident set size reported belongs to that backend alone. Every
+backend is also checked against the streaming scanner: an entry is counted as "same" when its type, key and fields
+are identical to the ones the scanner produced.
+
+Usage:
+    python benchmarks/parser_backends.py [--repeat N] [file.bib ...]
+
+With no files, the .bib files under tests/refs are used; --repeat concatenates the corpus N times to simulate a big
+export.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from BiblioAlly import translator as bibtex
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _entry_signature(proto_document):
+    return hash((proto_document['type'], proto_document['id'].strip(),
+                 tuple(sorted(proto_document['field'].items()))))
+
+
+def _run_backend(parser, filename, results):
+    start = time.perf_counter()
+    try:
+        signatures = [_entry_signature(pd) for pd in bibtex.Translator.parsers[parser](filename)]
+    except Exception as error:
+        results.put((None, f'{type(error).__name__}: {error}'.splitlines()[0], None))
+        return
+    elapsed = time.perf_counter() - start
+    results.put((signatures, elapsed, _peak_rss_mib()))
+
+
+def benchmark(parser, filename):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_backend, args=(parser, filename, results))
+    process.start()
+    outcome = results.get()
+    process.join()
+    return outcome
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arguments.add_argument('files', nargs='*')
+    arguments.add_argument('--repeat', type=int, default=1)
+    options = arguments.parse_args()
+    files = options.files
+    if len(files) == 0:
+        files = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'refs',
+                                              '*.bib')))
+    files = [f for f in files if not os.path.basename(f).startswith('exported_')]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.bib', encoding='utf-8', delete=False) as corpus:
+        for _ in range(options.repeat):
+            for filename in files:
+                with open(filename, 'r', encoding='utf-8') as bib_file:
+                    corpus.write(bib_file.read())
+                corpus.write('\n')
+    try:
+        size = os.path.getsize(corpus.name) / (1024 * 1024)
+        print(f'Corpus: {len(files)} file(s) x {options.repeat} = {size:.1f} MiB')
+        reference = None
+        rows = []
+        for parser in [bibtex.PARSER_SCANNER] + sorted(p for p in bibtex.Translator.parsers
+                                                       if p != bibtex.PARSER_SCANNER):
+            signatures, elapsed, peak = benchmark(parser, corpus.name)
+            if signatures is None:
+                rows.append((parser, '-', '-', '-', f'failed ({elapsed})'))
+                continue
+            if reference is None:
+                reference = signatures
+            same = sum(1 for signature, expected in zip(signatures, reference) if signature == expected)
+            rows.append((parser, f'{len(signatures)}', f'{len(signatures) / elapsed:,.0f}',
+                         '-' if peak is None else f'{peak:,.1f}', f'{same}/{len(reference)}'))
+        print(f'{"backend":<10} {"entries":>8} {"entries/s":>12} {"peak RSS MiB":>13} {"same":>12}')
+        for row in rows:
+            print(f'{row[0]:<10} {row[1]:>8} {row[2]:>12} {row[3]:>13} {row[4]:>12}')
+    finally:
+        os.remove(corpus.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares the cost of the hot lookups of Catalog before and after the indexes added by schema migration 3.
+
+A catalog is filled from a corpus built from tests/refs/web_of_science.bib, repeated with a distinct prefix in every
+title, DOI, first author and university, so every copy adds its own documents, authors and institutions. The indexes
+of migration 3 are then dropped and the following lookups are timed without them, and once more after the catalog is
+set back to schema version 2 and opened again, so migration 3 runs:
+    -author: Author by long name, as made by Catalog._author_by_name();
+    -institution: Institution by name, as made by Catalog._institution_by_name();
+    -doi: Catalog.document_by(doi=...);
+    -year: the amount of documents of a year;
+    -tag: Catalog.documents_by(tagged_as=...) for a tag assigned to a few documents;
+    -author documents: the documents of an author, a lookup of Document_R_Author by author.
+
+Usage:
+    python benchmarks/schema_indexes.py [--copies N] [--probes N]
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import func, select
+
+from BiblioAlly import catalog as cat, domain, wos
+
+INDEXES = ['ix_Author_long_name', 'ix_Institution_name', 'ix_Document_doi', 'ix_Document_year',
+           'ix_Document_R_Tag_tag_id', 'ix_Document_R_Author_author_id']
+
+
+def _corpus(filename, copies):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'refs', 'web_of_science.bib'),
+              'r', encoding='utf-8') as bib_file:
+        content = bib_file.read()
+    with open(filename, 'w', encoding='utf-8') as corpus:
+        for copy in range(copies):
+            copy_content = re.sub(r'(\n(Title|Author) = {+)', lambda match: match.group(1) + f'Copy{copy} ', content)
+            copy_content = re.sub(r'(\nDOI = {+)', lambda match: match.group(1) + f'{copy}/', copy_content)
+            corpus.write(re.sub(r'\bUniv ', f'Univ Copy{copy} ', copy_content))
+            corpus.write('\n')
+
+
+def _sample(generator, population, count):
+    return generator.sample(population, min(count, len(population)))
+
+
+def _workload(catalog, probes):
+    session = catalog._session
+    return {
+        'author': lambda: [catalog._author_by_name(name, auto_create=False) for name in probes['authors']],
+        'institution': lambda: [catalog._institution_by_name(name, auto_create=False)
+                                for name in probes['institutions']],
+        'doi': lambda: [catalog.document_by(doi=doi) for doi in probes['dois']],
+        'year': lambda: [session.execute(select(func.count()).where(domain.Document.year == year)).scalar()
+                         for year in probes['years']],
+        'tag': lambda: catalog.documents_by(tagged_as=cat.TAG_PRE_SELECTED),
+        'author documents': lambda: [session.execute(select(domain.DocumentAuthor.document_id)
+                                                     .where(domain.DocumentAuthor.author_id == author_id)).all()
+                                     for author_id in probes['author_ids']],
+    }
+
+
+def _timings(catalog, probes):
+    timings = dict()
+    for name, lookup in _workload(catalog, probes).items():
+        catalog._session.expire_all()
+        start = time.perf_counter()
+        lookup()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arguments.add_argument('--copies', type=int, default=200)
+    arguments.add_argument('--probes', type=int, default=200)
+    options = arguments.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = os.path.join(folder, 'corpus.bib')
+        filename = os.path.join(folder, 'indexes.db')
+        _corpus(corpus, options.copies)
+        catalog = cat.Catalog(filename, echo=False)
+        added_count, _, _ = catalog.import_from_file(wos.WebOfScience, corpus, bulk=True)
+        generator = random.Random(4348)
+        documents = catalog.documents_by()
+        for document in generator.sample(documents, 20):
+            catalog.tag(document, cat.TAG_PRE_SELECTED)
+        catalog.commit()
+        authors = catalog.authors_by()
+        institutions = catalog._session.execute(select(domain.Institution)).scalars().all()
+        probes = {
+            'authors': [author.long_name for author in _sample(generator, authors, options.probes)],
+            'author_ids': [author.id for author in _sample(generator, authors, options.probes)],
+            'institutions': [institution.name for institution in _sample(generator, institutions, options.probes)],
+            'dois': [d.doi for d in _sample(generator, [d for d in documents if d.doi is not None], options.probes)],
+            'years': sorted({d.year for d in documents}),
+        }
+        catalog.close()
+
+        connection = sqlite3.connect(filename)
+        for index in INDEXES:
+            connection.execute(f'DROP INDEX {index}')
+        connection.close()
+        catalog = cat.Catalog(filename, echo=False)
+        before = _timings(catalog, probes)
+        catalog.close()
+        connection = sqlite3.connect(filename)
+        connection.execute('DELETE FROM Schema_Version WHERE version >= 3')
+        connection.commit()
+        connection.close()
+        start = time.perf_counter()
+        catalog = cat.Catalog(filename, echo=False)
+        migration_elapsed = time.perf_counter() - start
+        after = _timings(catalog, probes)
+        catalog.close()
+
+        print(f'{added_count:,} documents, up to {options.probes} probes per lookup; migration took '
+              f'{migration_elapsed:.2f} s')
+        print(f'{"lookup":<18} {"before ms":>10} {"after ms":>10} {"speed-up":>9}')
+        for name in before:
+            print(f'{name:<18} {before[name] * 1000:>10.1f} {after[name] * 1000:>10.1f} '
+                  f'{before[name] / after[name]:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
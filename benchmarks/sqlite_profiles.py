@@ -0,0 +1,69 @@
+"""
+Compares the SQLite connection profiles of Catalog on the same import and query workload.
+
+For each profile a new catalog is created and the following steps are timed:
+    -import: Catalog.import_from_file() through the ORM path, so the profile in use is the one measured;
+    -tag: tags a number of documents committing after each one, the way the GUI does;
+    -query: lists the documents tagged and not tagged as imported, a number of times.
+
+The corpus is built by corpus.write_scopus_copies(): tests/refs/scopus.bib repeated with a distinct prefix in every
+title and DOI, so every copy is added instead of being skipped as a duplicate.
+
+Usage:
+    python benchmarks/sqlite_profiles.py [--copies N] [--commits N] [--queries N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from BiblioAlly import catalog as cat, scopus
+from corpus import write_scopus_copies
+
+
+def benchmark(profile, corpus, folder, commits, queries):
+    catalog = cat.Catalog(os.path.join(folder, f'{profile}.db'), echo=False, profile=profile)
+    start = time.perf_counter()
+    added_count, _, _ = catalog.import_from_file(scopus.Scopus, corpus)
+    import_elapsed = time.perf_counter() - start
+
+    documents = catalog.documents_by()[:commits]
+    start = time.perf_counter()
+    for document in documents:
+        catalog.tag(document, cat.TAG_PRE_SELECTED)
+        catalog.commit()
+    tag_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(queries):
+        catalog.documents_by(tagged_as=cat.TAG_PRE_SELECTED)
+        catalog.documents_by(untagged_as=cat.TAG_PRE_SELECTED)
+        catalog._session.expire_all()
+    query_elapsed = time.perf_counter() - start
+    catalog.close()
+    return added_count, import_elapsed, tag_elapsed, query_elapsed
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arguments.add_argument('--copies', type=int, default=20)
+    arguments.add_argument('--commits', type=int, default=500)
+    arguments.add_argument('--queries', type=int, default=5)
+    options = arguments.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = os.path.join(folder, 'corpus.bib')
+        write_scopus_copies(corpus, options.copies)
+        print(f'{"profile":<12} {"documents":>10} {"import s":>9} {"tag s":>9} {"commits/s":>10} {"query s":>9}')
+        for profile in cat.Catalog.profiles:
+            added_count, import_elapsed, tag_elapsed, query_elapsed = benchmark(profile, corpus, folder,
+                                                                                options.commits, options.queries)
+            print(f'{profile:<12} {added_count:>10} {import_elapsed:>9.2f} {tag_elapsed:>9.2f} '
+                  f'{options.commits / tag_elapsed:>10,.0f} {query_elapsed:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
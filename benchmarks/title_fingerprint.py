@@ -0,0 +1,85 @@
+"""
+Compares the 32-bit title_crc32 and the 64-bit title_fingerprint as duplicate detection keys.
+
+A catalog is filled with synthetic documents whose titles are random word sequences, all of them different. The
+benchmark reports how many of those different titles share a key (each such collision would tag an unrelated
+document as a duplicate), how long computing the keys takes, and how long the batched lookup made by each import
+takes for either key, both columns being indexed.
+
+Usage:
+    python benchmarks/title_fingerprint.py [--documents N] [--probes N] [--repeat N]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import insert
+
+from BiblioAlly import catalog as cat, domain
+from BiblioAlly.utility import alphanum_crc32, title_fingerprint
+
+
+def _titles(count, seed=4348):
+    generator = random.Random(seed)
+    words = [''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(generator.randint(3, 10)))
+             for _ in range(5000)]
+    titles = dict()
+    while len(titles) < count:
+        titles[' '.join(generator.choice(words) for _ in range(generator.randint(4, 12))).capitalize()] = None
+    return list(titles)
+
+
+def _collisions(keys):
+    return len(keys) - len(set(keys))
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arguments.add_argument('--documents', type=int, default=300000)
+    arguments.add_argument('--probes', type=int, default=10000)
+    arguments.add_argument('--repeat', type=int, default=5)
+    options = arguments.parse_args()
+
+    titles = _titles(options.documents + options.probes // 2)
+    stored_titles = titles[:options.documents]
+    probe_titles = titles[options.documents:] + random.Random(1).sample(stored_titles, options.probes // 2)
+    crc32s, crc32_elapsed = _timed(lambda: [alphanum_crc32(title) for title in stored_titles])
+    fingerprints, fingerprint_elapsed = _timed(lambda: [title_fingerprint(title) for title in stored_titles])
+
+    with tempfile.TemporaryDirectory() as folder:
+        catalog = cat.Catalog(os.path.join(folder, 'fingerprint.db'), echo=False)
+        today = datetime.date.today()
+        catalog._session.execute(insert(domain.Document.__table__), [
+            {'title': title, 'title_crc32': crc32, 'title_fingerprint': fingerprint, 'abstract': '',
+             'external_key': f'K{index}', 'year': 2020, 'kind': 'article', 'generator': 'Benchmark',
+             'import_date': today} for index, (title, crc32, fingerprint) in enumerate(zip(stored_titles, crc32s,
+                                                                                          fingerprints))])
+        catalog.commit()
+        print(f'{options.documents:,} different titles, {len(probe_titles):,} looked up, '
+              f'half of them stored, best of {options.repeat} runs')
+        print(f'{"key":<18} {"collisions":>10} {"key ms":>9} {"lookup ms":>10} {"found":>7}')
+        for name, key, collisions, elapsed in [
+                ('title_crc32', alphanum_crc32, _collisions(crc32s), crc32_elapsed),
+                ('title_fingerprint', title_fingerprint, _collisions(fingerprints), fingerprint_elapsed)]:
+            probes = [key(title) for title in probe_titles]
+            lookups = [_timed(catalog._originals_by, name, probes) for _ in range(options.repeat)]
+            found = len(lookups[0][0])
+            print(f'{name:<18} {collisions:>10} {elapsed * 1000:>9.0f} {min(t for _, t in lookups) * 1000:>10.1f} '
+                  f'{found:>7}')
+        catalog.close()
+
+
+if __name__ == '__main__':
+    main()
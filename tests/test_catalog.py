@@ -1,6 +1,12 @@
+import asyncio
+import os
+import re
+import sqlite3
+import tempfile
 import unittest
-from unittest import TestCase
-from BiblioAlly import catalog as cat, domain, wos as wos, ieee as ieee, acmdl as acm, scopus as scopus
+from unittest import TestCase, mock
+from sqlalchemy import event
+from BiblioAlly import catalog as cat, domain, scanner, wos as wos, ieee as ieee, acmdl as acm, scopus as scopus
 
 bibtex_path = 'refs/'
 
@@ -76,6 +82,17 @@ class TestCatalog(TestCase):
         # Assert
         self.assertEqual(file_count, 0, 'Unexpected load count')
 
+    def test_import_refs_with_invalid_parser(self):
+        # Arrange
+        ally = cat.Catalog(self.catalog_path)
+
+        # Act
+        added_count, file_count, base_count = ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib',
+                                                                    parser='INVALID')
+
+        # Assert
+        self.assertEqual(file_count, 0, 'Unexpected load count')
+
     @unittest.skip("skipping ACM DL")
     def test_import_refs_from_acm_dl(self):
         # Arrange
@@ -85,7 +102,7 @@ class TestCatalog(TestCase):
         added_count, file_count, base_count = ally.import_from_file(acm.AcmDL, bibtex_path + 'acm_dl.bib')
 
         # Assert
-        self.assertEqual(202, file_count, 'Unexpected load count')
+        self.assertEqual(203, file_count, 'Unexpected load count')
 
     @unittest.skip("skipping IEEEXplore")
     def test_import_refs_from_ieee_xplore(self):
@@ -96,7 +113,7 @@ class TestCatalog(TestCase):
         added_count, file_count, base_count = ally.import_from_file(ieee.IeeeXplore, bibtex_path + 'ieeexplore.bib')
 
         # Assert
-        self.assertEqual(172, file_count, 'Unexpected load count')
+        self.assertEqual(173, file_count, 'Unexpected load count')
 
     @unittest.skip("skipping Scopus")
     def test_import_refs_from_scopus(self):
@@ -107,7 +124,7 @@ class TestCatalog(TestCase):
         added_count, file_count, base_count = ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
 
         # Assert
-        self.assertEqual(125, file_count, 'Unexpected load count')
+        self.assertEqual(126, file_count, 'Unexpected load count')
 
     @unittest.skip("skipping Web of Science")
     def test_import_refs_from_web_of_science(self):
@@ -118,7 +135,621 @@ class TestCatalog(TestCase):
         added_count, file_count, base_count = ally.import_from_file(wos.WebOfScience, bibtex_path + 'web_of_science.bib')
 
         # Assert
-        self.assertEqual(51, file_count, 'Unexpected load count')
+        self.assertEqual(52, file_count, 'Unexpected load count')
+
+    def test_import_refs_from_files(self):
+        # Arrange
+        sources = [(scopus.Scopus, bibtex_path + 'scopus.bib'), (wos.WebOfScience, bibtex_path + 'web_of_science.bib'),
+                   ('INVALID', bibtex_path + 'invalid.bib'), (scopus.Scopus, bibtex_path + 'scopus.bib')]
+        with tempfile.TemporaryDirectory() as folder:
+            serial_ally = cat.Catalog(os.path.join(folder, 'serial.db'), echo=False)
+            serial_counts = [serial_ally.import_from_file(source, filename) for source, filename in sources]
+            ally = cat.Catalog(os.path.join(folder, 'parallel.db'), echo=False)
+
+            # Act
+            counts = ally.import_from_files(sources, workers=2)
+
+            # Assert
+            self.assertEqual(serial_counts, counts, 'Unexpected import counts')
+            self.assertEqual(len(serial_ally.authors_by()), len(ally.authors_by()), 'Unexpected author count')
+            self.assertEqual(len(serial_ally.keywords_by()), len(ally.keywords_by()), 'Unexpected keyword count')
+            serial_ally.close()
+            ally.close()
+
+    def test_import_refs_detect_duplicates(self):
+        # Arrange
+        sources = [(scopus.Scopus, bibtex_path + 'scopus.bib'), (wos.WebOfScience, bibtex_path + 'web_of_science.bib'),
+                   (ieee.IeeeXplore, bibtex_path + 'ieeexplore.bib'), (scopus.Scopus, bibtex_path + 'scopus.bib')]
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'duplicates.db'), echo=False)
+
+            # Act
+            counts = [ally.import_from_file(source, filename) for source, filename in sources]
+            duplicates = ally.documents_by(tagged_as=cat.TAG_DUPLICATE)
+
+            # Assert
+            self.assertEqual([(125, 126, 125), (52, 52, 177), (172, 173, 349), (0, 126, 349)], counts,
+                             'Unexpected import counts')
+            self.assertTrue(len(duplicates) > 0, 'No duplicates detected')
+            for duplicate in duplicates:
+                original = duplicate.original_document
+                self.assertIsNotNone(original, 'Duplicate not linked to its original')
+                self.assertEqual(original.title_fingerprint, duplicate.title_fingerprint, 'Unexpected original')
+                self.assertNotEqual(original.generator, duplicate.generator, 'Unexpected original')
+            ally.close()
+
+    def test_import_refs_detect_near_duplicates(self):
+        # Arrange
+        entry = '@ARTICLE{{{key},\nauthor={{Amber, F. and Yousaf, A.}},\ntitle={{{title}}},\n' \
+                'journal={{Brain Signals}},\nyear={{{year}}},\n{doi}abstract={{Lie detection from brain signals.}},\n' \
+                'author_keywords={{deception detection}},\ndocument_type={{Article}},\nsource={{Scopus}},\n}}\n\n'
+        original_title = 'P300 Based Deception Detection Using Convolutional Neural Network'
+        entries = {'Near2019': ('P300-based deception detection using a convolutional neural network', 2019, ''),
+                   'OtherDoi2019': ('P300 based deception detection using a deep convolutional neural network', 2019,
+                                    'doi={10.1000/other.2019},\n'),
+                   'Late2023': ('P300-Based Deception Detection with Convolutional Neural Networks', 2023, '')}
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'variants.bib')
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                for key, (title, year, doi) in entries.items():
+                    bib_file.write(entry.format(key=key, title=title, year=year, doi=doi))
+            for bulk in [False, True]:
+                ally = cat.Catalog(os.path.join(folder, f'near_{bulk}.db'), echo=False)
+
+                # Act
+                ally.import_from_file(ieee.IeeeXplore, bibtex_path + 'ieeexplore.bib')
+                ally.import_from_file(acm.AcmDL, bibtex_path + 'acm_dl.bib', bulk=bulk)
+                ally.import_from_file(scopus.Scopus, filename, bulk=bulk)
+                variants = {key: ally.document_by(title=title) for key, (title, _, _) in entries.items()}
+                acm_document = ally.document_by(doi='10.1145/2818346.2820758')
+
+                # Assert
+                near = variants['Near2019']
+                self.assertTrue(near.is_tagged(cat.TAG_DUPLICATE), 'Near-duplicate not detected')
+                self.assertEqual(original_title, near.original_document.title, 'Unexpected original')
+                self.assertGreaterEqual(near.duplicate_similarity, cat.NEAR_DUPLICATE_THRESHOLD,
+                                        'Unexpected similarity')
+                for other in [variants['OtherDoi2019'], variants['Late2023'], acm_document]:
+                    self.assertIsNone(other.original_document, f'{other.title} ({other.year}) taken as a duplicate')
+                ally.close()
+
+    def test_import_refs_after_deleting_document(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'deleted.db'), echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            document = ally.documents_by()[3]
+            title = document.title
+            ally._session.delete(document)
+            ally.commit()
+
+            # Act
+            added_count, _, _ = ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+
+            # Assert
+            self.assertEqual(1, added_count, 'Deleted document not imported again')
+            self.assertFalse(ally.document_by(title=title).is_tagged(cat.TAG_DUPLICATE),
+                             'Document imported again as a duplicate of itself')
+            self.assertEqual(0, ally._session.execute(cat.select(cat.func.count()).select_from(domain.TitleBand).where(
+                domain.TitleBand.document_id.not_in(cat.select(domain.Document.id)))).scalar(),
+                'Title bands of the deleted document kept')
+            ally.close()
+
+    def test_import_refs_look_up_entities_in_bulk(self):
+        # Arrange
+        with open(bibtex_path + 'web_of_science.bib', 'r', encoding='utf-8') as bib_file:
+            content = bib_file.read()
+        entities = ['Author', 'Institution', 'Keyword']
+
+        def renamed(copy):
+            # Every word of the names, titles and DOIs gets a prefix of its own, so each copy brings new entities
+            return re.sub(r'(\n(Author|Title|Affiliation|DOI|Keywords|Keywords-Plus) = )(.*?)(?=,\n\S|\n})',
+                          lambda match: match.group(1) + re.sub(r'\b([A-Za-z])', f'C{copy}\\1', match.group(3)),
+                          content, flags=re.S)
+
+        def lookups(folder, copies):
+            filename = os.path.join(folder, f'copies_{copies}.bib')
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write('\n'.join(renamed(copy) for copy in range(copies)))
+            ally = cat.Catalog(os.path.join(folder, f'copies_{copies}.db'), echo=False)
+            statements = []
+            event.listen(ally._engine, 'before_cursor_execute',
+                             lambda connection, cursor, statement, *_: statements.append(statement))
+            ally.import_from_file(wos.WebOfScience, filename)
+            counts = {entity: ally._session.query(getattr(domain, entity)).count() for entity in entities}
+            ally.close()
+            return counts, {entity: len([s for s in statements if s.startswith('SELECT')
+                                         and re.search(rf'FROM "?{entity}"?\s', s)]) for entity in entities}
+
+        with tempfile.TemporaryDirectory() as folder:
+            # Act
+            single_counts, single_lookups = lookups(folder, 1)
+            double_counts, double_lookups = lookups(folder, 2)
+
+        # Assert
+        for entity in entities:
+            self.assertGreater(double_counts[entity], single_counts[entity], f'No new {entity} rows imported')
+            self.assertEqual(single_lookups[entity], double_lookups[entity],
+                             f'{entity} lookups grow with the {entity} rows imported')
+
+    def test_import_refs_detect_duplicates_by_doi(self):
+        # Arrange
+        with open(bibtex_path + 'scopus.bib', 'r', encoding='utf-8') as bib_file:
+            content = bib_file.read()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'retitled.bib')
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write(re.sub(r'(\n\s*title\s*=\s*{)', lambda match: match.group(1) + 'Revised: ', content))
+            retitled_documents = scopus.ScopusTranslator().documents_from_file(filename)
+            ally = cat.Catalog(os.path.join(folder, 'doi.db'), echo=False)
+            ally.near_duplicate_threshold = None
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+
+            # Act
+            added_count, _, _ = ally.import_from_file(scopus.Scopus, filename)
+
+            # Assert
+            self.assertEqual(len({d.title_fingerprint for d in retitled_documents if d.doi_normalized is None}),
+                             added_count, 'Documents with a known DOI added again')
+            self.assertTrue(all(d.doi_normalized is None for d in ally.documents_by() if d.title.startswith('Revised')),
+                            'Document with a known DOI added again')
+            ally.close()
+
+    def test_open_backfills_derived_columns(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'backfill.db')
+            ally = cat.Catalog(filename, echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            expected = sorted((d.id, d.doi_normalized, d.title_fingerprint) for d in ally.documents_by())
+            ally.close()
+            connection = sqlite3.connect(filename)
+            connection.execute('DROP INDEX ix_Document_doi_normalized')
+            connection.execute('ALTER TABLE Document DROP COLUMN doi_normalized')
+            connection.execute('DROP INDEX ix_Document_title_fingerprint')
+            connection.execute('ALTER TABLE Document DROP COLUMN title_fingerprint')
+            connection.execute('DROP TABLE Schema_Version')
+            connection.commit()
+            connection.close()
+
+            # Act
+            ally = cat.Catalog(filename, echo=False)
+
+            # Assert
+            self.assertEqual(expected,
+                             sorted((d.id, d.doi_normalized, d.title_fingerprint) for d in ally.documents_by()),
+                             'Normalized DOIs and title fingerprints not backfilled')
+            ally.close()
+
+    def test_search_documents(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'search.db')
+            ally = cat.Catalog(filename, echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            ally.close()
+            connection = sqlite3.connect(filename)
+            connection.execute('DROP TABLE Document_Search')
+            connection.execute('DELETE FROM Schema_Version WHERE version >= 2')
+            connection.commit()
+            connection.close()
+
+            # Act
+            ally = cat.Catalog(filename, echo=False)
+            document = ally.documents_by()[7]
+            document.keywords.append(domain.Keyword(name='Zyzzyva', import_date=document.import_date))
+            document.title = 'Quixotic ' + document.title
+            ally.commit()
+            found = ally.search('deception')
+            limited = ally.search('deception', limit=3)
+            duplicates = ally.search('deception', tagged_as=cat.TAG_DUPLICATE)
+
+            # Assert
+            self.assertTrue(len(found) > 3, 'Documents not found')
+            for d in found:
+                text = ' '.join([d.title, d.abstract] + [k.name for k in d.keywords]).lower()
+                self.assertIn('decept', text, 'Document found does not match the query')
+            self.assertEqual(found[:3], limited, 'Search results not limited')
+            self.assertTrue(all(d.is_tagged(cat.TAG_DUPLICATE) for d in duplicates), 'Search results not filtered')
+            self.assertEqual([document], ally.search('zyzzyva'), 'Keyword not indexed')
+            self.assertEqual([document], ally.search('title:quixotic'), 'Title not reindexed')
+            ally.close()
+
+    def test_search_documents_without_fts5(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'plain.db')
+            with mock.patch.object(cat, '_supports_fts5', return_value=False):
+                ally = cat.Catalog(filename, echo=False)
+
+                # Act
+                added_count, _, _ = ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+
+                # Assert
+                self.assertEqual(125, added_count, 'Documents not imported without FTS5')
+                with self.assertRaises(RuntimeError):
+                    ally.search('deception')
+                ally.close()
+            ally = cat.Catalog(filename, echo=False)
+            self.assertTrue(len(ally.search('deception')) > 3, 'Index not created once FTS5 is available')
+            ally.close()
+
+    def test_open_catalog_indexed_by_fts5_without_fts5(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'indexed.db')
+            ally = cat.Catalog(filename, echo=False)
+            ally.import_from_file(acm.AcmDL, bibtex_path + 'acm_dl.bib')
+            ally.close()
+            with mock.patch.object(cat, '_supports_fts5', return_value=False):
+                ally = cat.Catalog(filename, echo=False)
+
+                # Act
+                added_count, _, _ = ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+
+                # Assert
+                self.assertEqual(126, added_count, 'Documents not imported without FTS5')
+                with self.assertRaises(RuntimeError):
+                    ally.search('deception')
+                ally.close()
+            connection = sqlite3.connect(filename)
+            triggers = connection.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                          "AND name LIKE 'Document_Search%'").fetchall()
+            connection.close()
+            self.assertEqual([], triggers, 'Full-text index triggers kept without FTS5')
+            ally = cat.Catalog(filename, echo=False)
+            indexed_count = ally._session.connection().exec_driver_sql('SELECT count(*) FROM Document_Search').scalar()
+            self.assertEqual(len(ally.documents_by()), indexed_count, 'Index not rebuilt once FTS5 is available')
+            self.assertTrue(len(ally.search('deception')) > 3, 'Documents imported without FTS5 not indexed')
+            ally.close()
+
+    def test_open_migrates_schema(self):
+        # Arrange
+        indexes = ['ix_Author_long_name', 'ix_Institution_name', 'ix_Document_doi', 'ix_Document_year',
+                   'ix_Document_R_Tag_tag_id', 'ix_Document_R_Author_author_id']
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'migrate.db')
+            ally = cat.Catalog(filename, echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            ally.close()
+            connection = sqlite3.connect(filename)
+            for index in indexes:
+                connection.execute(f'DROP INDEX {index}')
+            connection.execute('DROP TABLE Schema_Version')
+            connection.close()
+
+            # Act
+            ally = cat.Catalog(filename, echo=False)
+            versions = [(v.version, v.description) for v in ally._session.execute(
+                cat.select(domain.SchemaVersion).order_by(domain.SchemaVersion.version)).scalars()]
+            ally.close()
+
+            # Assert
+            self.assertEqual([(version, description) for version, description, _ in cat._schema_migrations], versions,
+                             'Migrations not recorded')
+            connection = sqlite3.connect(filename)
+            existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            plan = ' '.join(str(row) for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM Author WHERE long_name = 'Einstein, Albert'"))
+            connection.close()
+            self.assertEqual([], [index for index in indexes if index not in existing], 'Indexes not created')
+            self.assertIn('ix_Author_long_name', plan, 'Author names not looked up by index')
+
+    def test_import_refs_in_bulk(self):
+        # Arrange
+        sources = [(scopus.Scopus, bibtex_path + 'scopus.bib'), (wos.WebOfScience, bibtex_path + 'web_of_science.bib'),
+                   (acm.AcmDL, bibtex_path + 'acm_dl.bib'), (scopus.Scopus, bibtex_path + 'scopus.bib')]
+
+        def contents(ally):
+            return [(d.id, d.title, d.year, d.generator, d.original_document_id, d.import_date,
+                     [(a.author.id, a.author.long_name, a.first,
+                       None if a.institution is None else (a.institution.id, a.institution.name)) for a in d.authors],
+                     sorted(k.id for k in d.keywords), sorted(t.tag.name for t in d.tags))
+                    for d in sorted(ally.documents_by(), key=lambda d: d.id)]
+
+        with tempfile.TemporaryDirectory() as folder:
+            orm_ally = cat.Catalog(os.path.join(folder, 'orm.db'), echo=False)
+            orm_counts = [orm_ally.import_from_file(source, filename) for source, filename in sources]
+            ally = cat.Catalog(os.path.join(folder, 'bulk.db'), echo=False)
+
+            # Act
+            counts = [ally.import_from_file(source, filename, bulk=True) for source, filename in sources]
+
+            # Assert
+            self.assertEqual(orm_counts, counts, 'Unexpected import counts')
+            self.assertEqual(contents(orm_ally), contents(ally), 'Bulk import differs from ORM import')
+            orm_ally.close()
+            ally.close()
+
+    def test_import_empty_file_in_chunks(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'empty.bib')
+            open(filename, 'w').close()
+            ally = cat.Catalog(os.path.join(folder, 'empty.db'), echo=False)
+
+            # Act
+            counts = ally.import_from_file(scopus.Scopus, filename, chunk_size=40)
+
+            # Assert
+            self.assertEqual((0, 0, 0), counts, 'Unexpected import counts')
+            self.assertIsNone(ally._session.execute(cat.select(domain.ImportCheckpoint)).scalars().first(),
+                              'Checkpoint kept after the import finished')
+            ally.close()
+
+    def test_import_refs_in_chunks_resolve_keywords_by_name(self):
+        # Arrange
+        filename = bibtex_path + 'scopus.bib'
+        with tempfile.TemporaryDirectory() as folder:
+            whole_ally = cat.Catalog(os.path.join(folder, 'whole.db'), echo=False)
+            whole_ally.import_from_file(scopus.Scopus, filename)
+            ally = cat.Catalog(os.path.join(folder, 'chunked.db'), echo=False)
+            statements = []
+            event.listen(ally._engine, 'before_cursor_execute',
+                         lambda connection, cursor, statement, *_: statements.append(statement))
+
+            # Act
+            ally.import_from_file(scopus.Scopus, filename, chunk_size=10)
+
+            # Assert
+            self.assertEqual([], [s for s in statements if re.search(r'FROM "Keyword"\s+WHERE "Keyword".id = ', s)],
+                             'Keywords reloaded one by one')
+            self.assertEqual([sorted(k.name for k in d.keywords) for d in whole_ally.documents_by()],
+                             [sorted(k.name for k in d.keywords) for d in ally.documents_by()],
+                             'Chunked import differs from whole import')
+            self.assertEqual(len(whole_ally.keywords_by()), len(ally.keywords_by()), 'Keywords created twice')
+            whole_ally.close()
+            ally.close()
+
+    def test_import_refs_in_chunks_resumes(self):
+        # Arrange
+        filename = bibtex_path + 'scopus.bib'
+        progresses = []
+
+        def interrupt(progress):
+            progresses.append(progress)
+            if len(progresses) == 2:
+                raise KeyboardInterrupt()
+
+        with tempfile.TemporaryDirectory() as folder:
+            whole_ally = cat.Catalog(os.path.join(folder, 'whole.db'), echo=False)
+            whole_counts = whole_ally.import_from_file(scopus.Scopus, filename)
+            ally = cat.Catalog(os.path.join(folder, 'chunked.db'), echo=False)
+            with self.assertRaises(KeyboardInterrupt):
+                ally.import_from_file(scopus.Scopus, filename, chunk_size=40, progress=interrupt)
+
+            # Act
+            counts = ally.import_from_file(scopus.Scopus, filename, chunk_size=40, progress=progresses.append)
+
+            # Assert
+            self.assertEqual(whole_counts, counts, 'Unexpected import counts')
+            self.assertEqual([40, 80, 120, 126], [progress.entries for progress in progresses],
+                             'Import not resumed after the last committed chunk')
+            self.assertEqual([d.title for d in whole_ally.documents_by()], [d.title for d in ally.documents_by()],
+                             'Chunked import differs from whole import')
+            self.assertIsNone(ally._session.execute(cat.select(domain.ImportCheckpoint)).scalars().first(),
+                              'Checkpoint kept after the import finished')
+            whole_ally.close()
+            ally.close()
+
+    def test_import_and_export_refs_asynchronously(self):
+        # Arrange
+        filename = bibtex_path + 'scopus.bib'
+        progresses = []
+
+        async def cancel_and_resume(ally, exported_filename):
+            task = asyncio.ensure_future(ally.import_from_file_async(scopus.Scopus, filename, chunk_size=40,
+                                                                     progress=lambda p: task.cancel()))
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            counts = await ally.import_from_file_async(scopus.Scopus, filename, chunk_size=40,
+                                                       progress=progresses.append)
+            exported_count = await ally.export_to_file_async(scopus.Scopus, exported_filename)
+            return counts, exported_count
+
+        with tempfile.TemporaryDirectory() as folder:
+            whole_ally = cat.Catalog(os.path.join(folder, 'whole.db'), echo=False)
+            whole_counts = whole_ally.import_from_file(scopus.Scopus, filename)
+            whole_ally.export_to_file(scopus.Scopus, os.path.join(folder, 'whole.bib'))
+            ally = cat.Catalog(os.path.join(folder, 'async.db'), echo=False)
+
+            # Act
+            counts, exported_count = asyncio.run(cancel_and_resume(ally, os.path.join(folder, 'async.bib')))
+
+            # Assert
+            self.assertEqual(whole_counts, counts, 'Unexpected import counts')
+            self.assertEqual(126, progresses[-1].entries, 'Progress not reported to the event loop')
+            self.assertEqual(whole_counts[2], exported_count, 'Unexpected export count')
+            with open(os.path.join(folder, 'whole.bib'), 'r', encoding='utf-8') as whole_file, \
+                    open(os.path.join(folder, 'async.bib'), 'r', encoding='utf-8') as async_file:
+                self.assertEqual(whole_file.read(), async_file.read(), 'Asynchronous export differs')
+            whole_ally.close()
+            ally.close()
+
+    def test_import_refs_incrementally(self):
+        # Arrange
+        with open(bibtex_path + 'scopus.bib', 'r', encoding='utf-8') as bib_file:
+            entries = bib_file.read().split('\n@')
+        translated_counts = []
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'refs.bib')
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write('\n@'.join(entries[:100]))
+            whole_ally = cat.Catalog(os.path.join(folder, 'whole.db'), echo=False)
+            whole_counts = whole_ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            ally = cat.Catalog(os.path.join(folder, 'incremental.db'), echo=False)
+            import_documents = ally._import_documents
+            ally._import_documents = lambda documents, bulk: translated_counts.append(len(documents)) or \
+                import_documents(documents, bulk)
+            ally.import_from_file(scopus.Scopus, filename, incremental=True)
+            first_digests = {digest for digest, _, _ in scanner.entry_digests(filename)}
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write('\n@'.join(entries))
+            new_digests = {digest for digest, _, _ in scanner.entry_digests(filename)} - first_digests
+
+            # Act
+            counts = ally.import_from_file(scopus.Scopus, filename, incremental=True)
+            unchanged_counts = ally.import_from_file(scopus.Scopus, filename, incremental=True)
+
+            # Assert
+            self.assertEqual(whole_counts[1:], counts[1:], 'Unexpected import counts')
+            self.assertEqual((0, whole_counts[1], whole_counts[2]), unchanged_counts, 'Unchanged file imported again')
+            self.assertEqual([len(first_digests), len(new_digests)], translated_counts,
+                             'Known entries translated again')
+            self.assertEqual(sorted(d.title for d in whole_ally.documents_by()),
+                             sorted(d.title for d in ally.documents_by()), 'Incremental import differs from import')
+            whole_ally.close()
+            ally.close()
+
+    def test_import_refs_switches_profiles(self):
+        # Arrange
+        import_profiles = []
+
+        def pragmas(ally):
+            connection = ally._session.connection()
+            return [connection.exec_driver_sql(f'PRAGMA {pragma}').scalar() for pragma in ['journal_mode',
+                                                                                           'synchronous']]
+
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'profiles.db'), echo=False, profile=cat.PROFILE_INTERACTIVE)
+            import_documents = ally._import_documents
+            ally._import_documents = lambda *args: import_profiles.append(pragmas(ally)) or import_documents(*args)
+
+            # Act
+            interactive_pragmas = pragmas(ally)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib', bulk=True)
+            restored_pragmas = pragmas(ally)
+            ally.use_profile(cat.PROFILE_SAFE)
+            safe_pragmas = pragmas(ally)
+
+            # Assert
+            self.assertEqual(['wal', 1], interactive_pragmas, 'Interactive profile not applied')
+            self.assertEqual([['wal', 0]], import_profiles, 'Bulk import profile not applied')
+            self.assertEqual(['wal', 1], restored_pragmas, 'Former profile not restored after the import')
+            self.assertEqual(['delete', 2], safe_pragmas, 'Safe profile not applied')
+            self.assertRaises(ValueError, ally.use_profile, 'reckless')
+            ally.close()
+
+    def test_retrieve_documents_with_relationships_loaded(self):
+        # Arrange
+        statements = []
+
+        def touch(documents):
+            return [([(da.author.short_name, da.institution) for da in d.authors], [k.name for k in d.keywords],
+                     [dt.tag.name for dt in d.tags], len(d.references)) for d in documents]
+
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'load.db'), echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            expected = touch(ally.documents_by())
+            ally._session.expunge_all()
+            event.listen(ally._engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+            # Act
+            documents = ally.documents_by(load=cat.LOAD_EXPORT)
+            loaded = touch(documents)
+
+            # Assert
+            self.assertEqual(expected, loaded, 'Relationships loaded differ from those loaded lazily')
+            self.assertEqual(5, len(statements), 'Relationships not loaded up front')
+            ally.close()
+
+    def test_retrieve_documents_in_batches(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'batches.db'), echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            expected = sorted((d.id, d.title) for d in ally.documents_by(untagged_as=cat.TAG_DUPLICATE))
+            ally._session.expunge_all()
+            held_document = ally.document_by(id=expected[50][0])
+
+            # Act
+            tuples = cat.as_tuple(ally.iter_documents_by(untagged_as=cat.TAG_DUPLICATE, batch_size=40),
+                                  fields=['id', 'title'])
+            documents = list(ally.iter_documents_by(untagged_as=cat.TAG_DUPLICATE, batch_size=40))
+            ally.tag(held_document, cat.TAG_SELECTED)
+            ally.commit()
+
+            # Assert
+            self.assertEqual(expected, tuples, 'Documents streamed differ from those listed')
+            self.assertFalse(any(document in ally._session for document in documents if document is not held_document),
+                             'Documents streamed kept in the session')
+            self.assertTrue(ally.document_by(id=held_document.id, tagged_as=cat.TAG_SELECTED) is held_document,
+                            'Document held before the iteration not kept in the session')
+            ally.close()
+
+    def test_count_documents_by_tag(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'counts.db'), echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            ally.import_from_file(ieee.IeeeXplore, bibtex_path + 'ieeexplore.bib')
+            documents = ally.documents_by()
+            for document in documents[::7]:
+                ally.tag(document, cat.TAG_SELECTED)
+            ally.commit()
+            expected = {name: len([d for d in documents if d.is_tagged(name)]) for name in ally.system_tag_names}
+            expected_by_year = dict()
+            for document in documents:
+                if document.is_tagged(cat.TAG_SELECTED):
+                    expected_by_year[document.year] = expected_by_year.get(document.year, 0) + 1
+
+            # Act
+            counts = ally.tag_counts()
+            counts_by_year = ally.tag_counts([cat.TAG_SELECTED, cat.TAG_PRE_SELECTED, 'Unknown'], by='year')
+
+            # Assert
+            self.assertEqual(expected, counts, 'Unexpected tag counts')
+            self.assertEqual({cat.TAG_SELECTED: expected_by_year, cat.TAG_PRE_SELECTED: {}}, counts_by_year,
+                             'Unexpected tag counts by year')
+            with self.assertRaises(ValueError):
+                ally.tag_counts(by='nothing')
+            ally.close()
+
+    def test_retrieve_documents_by_tag_filters(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as folder:
+            ally = cat.Catalog(os.path.join(folder, 'filters.db'), echo=False)
+            ally.import_from_file(scopus.Scopus, bibtex_path + 'scopus.bib')
+            ally.import_from_file(ieee.IeeeXplore, bibtex_path + 'ieeexplore.bib')
+            documents = ally.documents_by()
+            for index, document in enumerate(documents):
+                for divisor, tag in [(2, 'A'), (3, 'B'), (5, 'C')]:
+                    if index % divisor == 0:
+                        ally.tag(document, tag)
+            ally.commit()
+
+            def expected(condition):
+                return sorted(d.id for d in documents if condition({t.tag.name for t in d.tags}))
+
+            def plan(**kwargs):
+                statement = ally._document_by(**kwargs).compile(ally._engine, compile_kwargs={'literal_binds': True})
+                return ' '.join(row[-1] for row in ally._session.connection()
+                                .exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}'))
+
+            # Act
+            tagged_any = [d.id for d in ally.documents_by(tagged_any=['A', 'B', 'Unknown'])]
+            tagged_all = [d.id for d in ally.documents_by(tagged_all=['A', 'B'], untagged_any='C')]
+            untagged_any = [d.id for d in ally.documents_by(tagged_as='A', untagged_any=['B', 'C'])]
+            unknown_all = ally.documents_by(tagged_all=['A', 'Unknown'])
+
+            # Assert
+            self.assertEqual(expected(lambda tags: tags & {'A', 'B'}), sorted(tagged_any), 'Wrong tagged_any')
+            self.assertEqual(expected(lambda tags: {'A', 'B'} <= tags and 'C' not in tags), sorted(tagged_all),
+                             'Wrong tagged_all')
+            self.assertEqual(expected(lambda tags: 'A' in tags and not tags & {'B', 'C'}), sorted(untagged_any),
+                             'Wrong untagged_any')
+            self.assertEqual([], unknown_all, 'Documents without an unknown tag retrieved')
+            for ids in [tagged_any, tagged_all, untagged_any]:
+                self.assertEqual(len(set(ids)), len(ids), 'Document retrieved more than once')
+            for kwargs, index in [({'tagged_any': ['A', 'B']}, 'ix_Document_R_Tag_tag_id'),
+                                  ({'tagged_all': ['A', 'B']}, 'ix_Document_R_Tag_tag_id'),
+                                  ({'untagged_any': ['A', 'B']}, 'sqlite_autoindex_Document_R_Tag_1')]:
+                query_plan = plan(**kwargs)
+                self.assertIn(index, query_plan, f'Index not used by {kwargs}')
+                self.assertNotIn('SCAN Document_R_Tag', query_plan, f'Document_R_Tag scanned by {kwargs}')
+            ally.close()
 
     def test_retrieve_document_by_id(self):
         # Arrange
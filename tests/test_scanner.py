@@ -0,0 +1,163 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from BiblioAlly import scanner, translator as bibtex, wos
+
+bibtex_path = 'refs/'
+
+
+class TestScanner(TestCase):
+    def test_scan_fields_with_inner_braces_and_commas(self):
+        # Arrange
+        content = '@ARTICLE{Key2020,\n' \
+                  'title={Fields {ending}, mid-line\n   and {wrapped}},\n' \
+                  'author={Doe, J. and Roe, R.},\n' \
+                  'year=2020,\n' \
+                  'source={Scopus}\n' \
+                  '}\n'
+
+        # Act
+        proto_documents = list(scanner.proto_documents_from_stream(io.StringIO(content)))
+
+        # Assert
+        self.assertEqual(1, len(proto_documents), 'Unexpected entry count')
+        proto_document = proto_documents[0]
+        self.assertEqual('article', proto_document['type'], 'Unexpected entry type')
+        self.assertEqual('Key2020', proto_document['id'], 'Unexpected entry key')
+        self.assertEqual('Fields ending, mid-line and wrapped', proto_document['field']['title'], 'Unexpected title')
+        self.assertEqual('Doe, J. and Roe, R.', proto_document['field']['author'], 'Unexpected author')
+        self.assertEqual('2020', proto_document['field']['year'], 'Unexpected year')
+        self.assertEqual('Scopus', proto_document['field']['source'], 'Unexpected source')
+
+    def test_scan_quoted_values(self):
+        # Arrange
+        content = '@misc{Quoted, title = "Commas, {Braces} and \\"quotes\\"", year = {2021}}'
+
+        # Act
+        proto_document = next(scanner.proto_documents_from_stream(io.StringIO(content)))
+
+        # Assert
+        self.assertEqual('Commas, Braces and \\"quotes\\"', proto_document['field']['title'], 'Unexpected title')
+        self.assertEqual('2021', proto_document['field']['year'], 'Unexpected year')
+
+    def test_scan_entries_across_chunks(self):
+        # Arrange
+        with open(bibtex_path + 'web_of_science.bib', 'r', encoding='utf-8') as bib_file:
+            content = bib_file.read()
+
+        # Act
+        whole = list(scanner.proto_documents_from_stream(io.StringIO(content), chunk_size=len(content)))
+        chunked = list(scanner.proto_documents_from_stream(io.StringIO(content), chunk_size=7))
+
+        # Assert
+        self.assertEqual(52, len(whole), 'Unexpected entry count')
+        self.assertEqual(whole, chunked, 'Chunked scan differs from whole scan')
+
+    def test_scan_skips_comments(self):
+        # Arrange
+        content = '@comment{exported by someone}\n@preamble{"\\newcommand"}\n@book{B1, title={Book}}\n'
+
+        # Act
+        proto_documents = list(scanner.proto_documents_from_stream(io.StringIO(content)))
+
+        # Assert
+        self.assertEqual(1, len(proto_documents), 'Unexpected entry count')
+        self.assertEqual('B1', proto_documents[0]['id'], 'Unexpected entry key')
+
+    def test_parser_backends_agree_on_entries(self):
+        # Arrange
+        special_content = '@comment{jabref-meta: databaseType:bibtex;}\n' \
+                          '@preamble{"\\newcommand{\\noop}[1]{}"}\n' \
+                          '@String{ieee = "IEEE"}\n' \
+                          '@ARTICLE{Bare2020,\ntitle={Bare {Last} Value},\nyear = 2020\n}\n' \
+                          '@COMMENT{trailing {nested} comment}\n'
+        filenames = [bibtex_path + name
+                     for name in ['acm_dl.bib', 'ieeexplore.bib', 'scopus.bib', 'web_of_science.bib']]
+        # The former line parser is kept for comparison only and is known to differ
+        parsers = [parser for parser in bibtex.Translator.parsers
+                   if parser not in [bibtex.PARSER_SCANNER, bibtex.PARSER_LINE]]
+
+        with tempfile.TemporaryDirectory() as folder:
+            special_filename = os.path.join(folder, 'special.bib')
+            with open(special_filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write(special_content)
+            for filename in filenames + [special_filename]:
+                # Act
+                scanned = list(bibtex.Translator.parsers[bibtex.PARSER_SCANNER](filename))
+                parsed = {parser: list(bibtex.Translator.parsers[parser](filename)) for parser in parsers}
+
+                # Assert
+                for parser in parsers:
+                    self.assertEqual([(pd['type'], pd['id'], pd['field']) for pd in scanned],
+                                     [(pd['type'], pd['id'], pd['field']) for pd in parsed[parser]],
+                                     f'Parser backend {parser} disagrees with the scanner on {filename}')
+            self.assertEqual([('article', 'Bare2020', {'title': 'Bare Last Value', 'year': '2020'})],
+                             [(pd['type'], pd['id'], pd['field']) for pd in scanned],
+                             'Unexpected entries scanned')
+
+    def test_scan_entry_ranges(self):
+        # Arrange
+        filename = bibtex_path + 'ieeexplore.bib'
+        whole = list(scanner.proto_documents_from_file(filename))
+
+        # Act
+        ranges = scanner.entry_ranges(filename, 5)
+        split = [pd for start, end in ranges for pd in scanner.proto_documents_from_range(filename, start, end)]
+
+        # Assert
+        self.assertEqual(5, len(ranges), 'Unexpected range count')
+        self.assertEqual(whole, split, 'Ranged scan differs from whole scan')
+
+    def test_scan_entry_ranges_with_entries_in_values(self):
+        # Arrange
+        abstract = ''.join(f'Line {line}\n@foo{{bar}} and more\n' for line in range(200))
+        content = ''.join(f'@article{{Key{key},\ntitle={{Title {key}}},\nabstract={{{abstract}}},\n}}\n\n'
+                          for key in range(3))
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'nested.bib')
+            with open(filename, 'w', encoding='utf-8') as bib_file:
+                bib_file.write(content)
+            whole = list(scanner.proto_documents_from_file(filename))
+
+            # Act
+            ranges = scanner.entry_ranges(filename, 12)
+            split = [pd for start, end in ranges for pd in scanner.proto_documents_from_range(filename, start, end)]
+
+            # Assert
+            self.assertEqual([0, content.index('@article{Key1'), content.index('@article{Key2')],
+                             [start for start, _ in ranges], 'Range split inside a value')
+            self.assertEqual(whole, split, 'Ranged scan differs from whole scan')
+
+    def test_translate_file_in_parallel(self):
+        # Arrange
+        translator = wos.WoSBibTexTranslator()
+        filename = bibtex_path + 'web_of_science.bib'
+        serial = [(d.external_key, d.title, [da.author.long_name for da in d.authors],
+                   sorted(k.name for k in d.keywords)) for d in translator.documents_from_file(filename)]
+
+        # Act
+        parallel = [(d.external_key, d.title, [da.author.long_name for da in d.authors],
+                     sorted(k.name for k in d.keywords)) for d in translator.documents_from_file(filename, workers=2)]
+
+        # Assert
+        self.assertEqual(serial, parallel, 'Parallel translation differs from serial translation')
+
+    def test_scan_mapped_file(self):
+        # Arrange
+        filename = bibtex_path + 'web_of_science.bib'
+        scanned = list(scanner.proto_documents_from_file(filename))
+
+        # Act
+        mapped = list(scanner.proto_documents_from_mapped_file(filename))
+        split = [pd for start, end in scanner.entry_ranges(filename, 3)
+                 for pd in scanner.proto_documents_from_mapped_file(filename, start, end)]
+
+        # Assert
+        self.assertIsInstance(mapped[0]['field'], scanner.MappedFields, 'Mapped fields expected')
+        self.assertEqual(0, len(mapped[0]['field']._values), 'Field values decoded before being read')
+        self.assertEqual([(pd['type'], pd['id'], dict(pd['field'])) for pd in scanned],
+                         [(pd['type'], pd['id'], dict(pd['field'])) for pd in mapped],
+                         'Mapped scan differs from streaming scan')
+        self.assertEqual([dict(pd['field']) for pd in mapped], [dict(pd['field']) for pd in split],
+                         'Ranged mapped scan differs from whole mapped scan')
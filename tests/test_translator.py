@@ -0,0 +1,112 @@
+from unittest import TestCase
+from BiblioAlly import translator as bibtex
+from BiblioAlly.utility import KeywordMatcher, TitleMinHash, normalized_doi
+
+
+class TestTranslator(TestCase):
+    def test_keyword_matcher_prefers_keyword_order(self):
+        # Arrange
+        matcher = KeywordMatcher(['China', 'Chinese', 'Hong Kong', 'Kong'])
+
+        # Act
+        found = [matcher.first(text) for text in ['Hong Kong, China', 'Chinese Academy', 'Kowloon', 'King Kong', '']]
+
+        # Assert
+        self.assertEqual(['China', 'Chinese', None, 'Kong', None], found, 'Unexpected keywords found')
+
+    def test_title_min_hash_finds_near_duplicates(self):
+        # Arrange
+        min_hash = TitleMinHash()
+        title = min_hash.shingles('Deception Detection Using Real-Life Trial Data')
+
+        # Act
+        accented = min_hash.shingles('D\\\'{e}ception D\u00e9tection using real-life trial data')
+        longer = min_hash.shingles('Multimodal Deception Detection using Real-Life Trial Data')
+        other = min_hash.shingles('Role of sentiment analysis in social media security and analytics')
+
+        # Assert
+        self.assertEqual(1.0, TitleMinHash.similarity(title, accented), 'Accents not normalized')
+        self.assertGreater(TitleMinHash.similarity(title, longer), 0.75, 'Unexpected similarity')
+        self.assertLess(TitleMinHash.similarity(title, other), 0.1, 'Unexpected similarity')
+        self.assertTrue(set(min_hash.band_keys(title)) & set(min_hash.band_keys(longer)), 'No band key shared')
+        self.assertFalse(set(min_hash.band_keys(title)) & set(min_hash.band_keys(other)), 'Band key shared')
+
+    def test_normalized_doi(self):
+        # Arrange
+        dois = ['10.1002/WIDM.1366', ' https://doi.org/10.1002/widm.1366 ', 'http://dx.doi.org/10.1002%2Fwidm.1366',
+                'doi:10.1002/widm.1366', '', None, 'not available']
+
+        # Act
+        normalized = [normalized_doi(doi) for doi in dois]
+
+        # Assert
+        self.assertEqual(['10.1002/widm.1366'] * 4 + [None] * 3, normalized, 'Unexpected normalized DOIs')
+
+    def test_key_names_resolved_as_linear_search(self):
+        # Arrange
+        texts = ['United States of America', 'Microsoft AI Research', 'CASIA, Chinese Academy of Sciences',
+                 'NVIDIA Corp', 'Brazil', 'IBMIBM', 'U.S.A', 'HP Inc Palo Alto']
+        expected = [next((key_name for key_name in bibtex.key_names if text.find(key_name) > -1), None)
+                    for text in texts]
+
+        # Act
+        found = [bibtex._key_name_matcher.first(text) for text in texts]
+
+        # Assert
+        self.assertEqual(expected, found, 'Key names resolved differently from a linear search')
+
+    def test_affiliations_from_field(self):
+        # Arrange
+        translator = bibtex.Translator()
+        field = 'Dept. of Informatics, Univ. of Somewhere, Brazil; Adobe; Google Research, Mountain View, CA, USA'
+
+        # Act
+        affiliations = translator._affiliations_from_field(field)
+
+        # Assert
+        self.assertEqual([('Dept. of Informatics, Univ. of Somewhere', 'Brazil'), ('Adobe', 'USA'),
+                          ('Google Research, Mountain View, CA', 'USA')],
+                         [(a.institution.name, a.institution.country) for a in affiliations],
+                         'Unexpected affiliations')
+
+    def test_parsed_fields_are_cached(self):
+        # Arrange
+        translator = bibtex.Translator()
+        field = 'Doe, John and Roe, Richard and Doe, John'
+        statistics = bibtex.parse_cache_statistics()
+
+        # Act
+        first = translator._authors_from_field(field)
+        second = translator._authors_from_field(field)
+        cache_statistics = bibtex.parse_cache_statistics(since=statistics)['authors']
+
+        # Assert
+        self.assertEqual(['Doe, J.', 'Roe, R.'], [author.short_name for author in first], 'Unexpected authors')
+        self.assertEqual([a.short_name for a in first], [a.short_name for a in second], 'Cached authors differ')
+        self.assertTrue(all(a is not b for a, b in zip(first, second)), 'Cached authors must be fresh instances')
+        self.assertEqual((1, 1), (cache_statistics.hits, cache_statistics.misses), 'Unexpected cache statistics')
+
+    def test_authors_from_field_drop_repeated_authors(self):
+        # Arrange
+        field = ' and '.join(['John Doe', 'Roe, Richard', 'Doe, J.', 'Richard Roe', 'Roe, Rita'])
+
+        # Act
+        authors = bibtex.Translator._authors_from_field(field)
+
+        # Assert
+        self.assertEqual([('Doe, J.', 'Doe, John'), ('Roe, R.', 'Roe, Richard')],
+                         [(author.short_name, author.long_name) for author in authors], 'Unexpected authors')
+
+    def test_keywords_are_canonical(self):
+        # Arrange
+        translator = bibtex.Translator()
+
+        # Act
+        first = translator._keywords_from_field('deep learning; Face recognition ;Deep learning;', ';')
+        second = translator._keywords_from_field('face recognition, survey', ';,')
+
+        # Assert
+        self.assertEqual(['Deep learning', 'Face recognition', ''], [keyword.name for keyword in first],
+                         'Unexpected keywords')
+        self.assertEqual(['Face recognition', 'Survey'], [keyword.name for keyword in second], 'Unexpected keywords')
+        self.assertIs(first[1], second[0], 'Keywords with the same name must be the same instance')